@@ -0,0 +1,143 @@
+"""
+File downloads, streamed from storage in chunks.
+
+serve() answers conditional requests (If-None-Match) from an ETag, serves
+single byte ranges (Range, If-Range), and can hand the transfer off to the
+front web server instead with an X-Sendfile or X-Accel-Redirect header (see
+DOWNLOAD_SENDFILE_HEADER).
+"""
+
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+
+
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_chunks(fileobj, start=0, length=None):
+    """
+    Yields the contents of `fileobj` from `start`, up to `length` bytes (or
+    the end of the file), and closes it.
+    """
+    try:
+        fileobj.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            size = CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining)
+            data = fileobj.read(size)
+            if not data:
+                break
+            if remaining is not None:
+                remaining -= len(data)
+            yield data
+    finally:
+        fileobj.close()
+
+
+def file_etag(fieldfile):
+    """
+    SHA-256 of a stored file: from its name, for content-addressed storage,
+    or else computed in chunks and cached by name and size (stored files are
+    never modified in place).
+    """
+    content_hash = getattr(fieldfile.storage, 'content_hash', None)
+    etag = content_hash and content_hash(fieldfile.name)
+    if etag:
+        return etag
+
+    key = 'file-etag:%s:%d' % (hashlib.sha1(fieldfile.name.encode('utf-8')).hexdigest(), fieldfile.size)
+    etag = cache.get(key)
+    if etag is None:
+        digest = hashlib.sha256()
+        fieldfile.open('rb')
+        for chunk in file_chunks(fieldfile):
+            digest.update(chunk)
+        etag = digest.hexdigest()
+        cache.set(key, etag, None)
+    return etag
+
+
+def parse_range(header, size):
+    """
+    Returns the (first, last) byte positions of a single range request, None
+    if the header is absent or not supported (multiple ranges, other units),
+    or False if the range is not satisfiable.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = int(last) if last else size - 1
+    if first > last or first >= size:
+        return False
+    return first, min(last, size - 1)
+
+
+def sendfile_header(path, name):
+    header = settings.DOWNLOAD_SENDFILE_HEADER
+    if header == 'X-Accel-Redirect':
+        # nginx wants the URI of an internal location, not a file system path
+        return header, settings.DOWNLOAD_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + name
+    return header, path
+
+
+def serve(request, fileobj, size, etag, content_type, filename, stored=None):
+    """
+    Serves `fileobj` (size bytes long) as an attachment called `filename`.
+    `stored` is the (local path, storage name) of the file, if there is one,
+    for the web server to send the file itself.
+    """
+    etag = '"%s"' % etag
+
+    if etag in [t.strip() for t in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+        fileobj.close()
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    if stored and settings.DOWNLOAD_SENDFILE_HEADER:
+        fileobj.close()
+        response = HttpResponse(content_type=content_type)
+        header, value = sendfile_header(*stored)
+        response[header] = value
+    else:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if if_range and if_range != etag:
+            byte_range = None
+
+        if byte_range is False:
+            fileobj.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */%d' % size
+            return response
+
+        if byte_range is None:
+            response = StreamingHttpResponse(file_chunks(fileobj), content_type=content_type)
+            response['Content-Length'] = str(size)
+        else:
+            first, last = byte_range
+            length = last - first + 1
+            response = StreamingHttpResponse(file_chunks(fileobj, first, length), content_type=content_type, status=206)
+            response['Content-Length'] = str(length)
+            response['Content-Range'] = 'bytes %d-%d/%d' % (first, last, size)
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+    return response
@@ -0,0 +1,62 @@
+"""
+Largest-Triangle-Three-Buckets downsampling, from Sveinn Steinarsson's thesis
+"Downsampling Time Series for Visual Representation".
+"""
+
+
+def lttb(xs, ys, threshold):
+    """
+    Returns the indexes of the points to keep, at most `threshold` of them,
+    in ascending order. `xs` must be sorted.
+    """
+    n = len(xs)
+    if threshold >= n:
+        return range(n)
+    if threshold < 3:
+        # first and last only
+        return [0, n - 1][:max(threshold, 0)]
+
+    selected = [0]
+    every = float(n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # average of the next bucket
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(xs[next_start:next_end]) / float(next_end - next_start)
+        avg_y = sum(ys[next_start:next_end]) / float(next_end - next_start)
+
+        # point of the current bucket with the largest triangle
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        largest = -1
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > largest:
+                largest = area
+                a_next = j
+        selected.append(a_next)
+        a = a_next
+
+    selected.append(n - 1)
+    return selected
+
+
+def downsample(items, max_points, x, y):
+    """
+    Downsamples a list of objects to at most `max_points`, with `x` and `y`
+    extracting the coordinates of each item. Items are returned in the same
+    order as given, which can be either ascending or descending on `x`.
+    """
+    if not max_points or len(items) <= max_points:
+        return items
+
+    descending = x(items[0]) > x(items[-1])
+    ordered = list(reversed(items)) if descending else items
+    keep = lttb([x(i) for i in ordered], [y(i) for i in ordered], max_points)
+    result = [ordered[k] for k in keep]
+    if descending:
+        result.reverse()
+    return result
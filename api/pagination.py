@@ -1,10 +1,107 @@
+import base64
+import json
+
+from django.db import connection
+from django.db.models import Q
+
 from rest_framework import pagination
 from rest_framework import response
+from rest_framework.exceptions import NotFound
+
+
+def estimate_count(queryset):
+    """
+    Row count estimated by the PostgreSQL query planner, which is much
+    cheaper than an exact COUNT(*) on big tables.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, basestring):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
 
 
 class Pagination(pagination.PageNumberPagination):
+    """
+    Page number pagination, plus an opt-in keyset ("cursor") mode for views
+    that define `cursor_ordering`: passing a `cursor` parameter (empty for
+    the first page) returns the page after that cursor, and a `next` cursor
+    instead of a page number. Each page is then a single indexed query no
+    matter how deep it is, and `count` is the planner's estimate.
+    """
+
+    cursor_query_param = 'cursor'
+
+    __cursor__ = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering is None or self.cursor_query_param not in request.query_params:
+            self.__cursor__ = None
+            return super(Pagination, self).paginate_queryset(queryset, request, view)
+
+        self.__cursor__ = ordering
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        position = self.decode_cursor(request.query_params[self.cursor_query_param])
+        self.count = estimate_count(queryset)
+        if position:
+            queryset = queryset.filter(self.after(ordering, position))
+        queryset = queryset.order_by(*ordering)
+
+        page = list(queryset[:page_size + 1])
+        if len(page) > page_size:
+            page = page[:page_size]
+            last = page[-1]
+            if isinstance(last, dict):
+                # values() rows
+                position = [last[f.lstrip('-')] for f in ordering]
+            else:
+                position = [getattr(last, f.lstrip('-')) for f in ordering]
+            self.next_cursor = self.encode_cursor(position)
+        else:
+            self.next_cursor = None
+        return page
+
+    def after(self, ordering, position):
+        # (a, b) after (x, y) is a > x OR (a = x AND b > y), with < for
+        # descending fields
+        condition = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = '%s__%s' % (name, 'lt' if field.startswith('-') else 'gt')
+            equal = dict(
+                (f.lstrip('-'), v) for f, v in zip(ordering[:i], position[:i])
+            )
+            equal[lookup] = position[i]
+            condition |= Q(**equal)
+        return condition
+
+    def encode_cursor(self, values):
+        values = [v.isoformat() if hasattr(v, 'isoformat') else v for v in values]
+        return base64.urlsafe_b64encode(json.dumps(values))
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (TypeError, ValueError):
+            raise NotFound('Invalid cursor')
 
     def get_paginated_response(self, data):
+        if self.__cursor__ is not None:
+            return response.Response({
+                'page': {
+                    'next': self.next_cursor,
+                    'previous': None,
+                },
+                'count': self.count,
+                'results': data
+            })
 
         if self.page.has_next():
             next_page = self.page.next_page_number()
@@ -0,0 +1,72 @@
+"""
+JSON encoding for API responses.
+
+On Python 2 the json module only uses its C string encoder when
+`ensure_ascii` is on, so `dumps` always produces ASCII (non-ASCII text is
+escaped, which is equally valid JSON); simplejson is used instead when it is
+installed. StreamingJSONResponse encodes a JSON array a chunk of items at a
+time, so that big lists never have to be built or encoded at once.
+"""
+
+import json
+
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+
+
+_default = encoders.JSONEncoder().default
+
+
+def dumps(data):
+    if simplejson is not None:
+        return simplejson.dumps(data, default=_default, separators=(',', ':'))
+    return json.dumps(data, default=_default, separators=(',', ':'))
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    DRF's JSONRenderer, using `dumps` for compact output.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or not self.compact:
+            return super(JSONRenderer, self).render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+def iterencode(items, chunk_size=None):
+    """
+    Yields the JSON encoding of the list of `items` (any iterable), in
+    pieces of `chunk_size` items.
+    """
+    chunk_size = chunk_size or settings.JSON_STREAM_CHUNK_SIZE
+    items = iter(items)
+    separator = '['
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            break
+        yield separator + ','.join(dumps(item) for item in chunk)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+
+    def __init__(self, items, chunk_size=None, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super(StreamingJSONResponse, self).__init__(iterencode(items, chunk_size), **kwargs)
@@ -1,8 +1,13 @@
 import json
 import ast
 
+from collections import OrderedDict
+
+from django.utils import six
+
 from rest_framework import serializers
 from rest_framework.authtoken.models import Token
+from rest_framework.utils import model_meta
 
 from benchmarks import models as benchmarks_models
 
@@ -47,6 +52,7 @@ class TestJobSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = benchmarks_models.TestJob
+        read_only_fields = ('results_fingerprint', 'next_poll_at', 'poll_attempts')
 
 
 class ResultManifestSerializer(serializers.CharField):
@@ -72,11 +78,13 @@ class ResultManifestSerializer(serializers.CharField):
 class ResultSerializer(serializers.ModelSerializer):
     manifest = ResultManifestSerializer()
     permalink = serializers.CharField(read_only=True)
+    completed = serializers.BooleanField(read_only=True)
     test_jobs = TestJobSerializer(many=True, read_only=True)
     results = serializers.ListField(write_only=True, required=False)
 
     class Meta:
         model = benchmarks_models.Result
+        read_only_fields = ('total_jobs', 'completed_jobs', 'data_count', 'baseline_id')
 
     def create(self, validated_data):
         benchmark_results = validated_data.pop('results')
@@ -96,6 +104,7 @@ class ResultSerializer(serializers.ModelSerializer):
 
 class ManifestResultSerializer(serializers.ModelSerializer):
     permalink = serializers.CharField(read_only=True)
+    completed = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = benchmarks_models.Result
@@ -156,6 +165,21 @@ class ResultDataSerializer(serializers.ModelSerializer):
         model = benchmarks_models.ResultData
 
 
+class ResultDataRollupSerializer(serializers.ModelSerializer):
+    benchmark = serializers.CharField(source='benchmark.name', read_only=True)
+    created_at = serializers.DateTimeField(source='start', read_only=True)
+    measurement = serializers.FloatField(source='mean', read_only=True)
+    stdev = serializers.FloatField(read_only=True)
+    values = serializers.SerializerMethodField()
+
+    class Meta:
+        model = benchmarks_models.ResultDataRollup
+        fields = ('benchmark', 'name', 'created_at', 'measurement', 'stdev', 'values', 'count', 'period')
+
+    def get_values(self, obj):
+        return [obj.minimum, obj.maximum]
+
+
 class BenchmarkGroupSummarySerializer(serializers.ModelSerializer):
     result = serializers.CharField(source='result.id', read_only=True)
     build_id = serializers.CharField(source='result.build_id', read_only=True)
@@ -164,3 +188,185 @@ class BenchmarkGroupSummarySerializer(serializers.ModelSerializer):
     class Meta:
         model = benchmarks_models.BenchmarkGroupSummary
         fields = ('id', 'name', 'result', 'build_id', 'measurement', 'created_at')
+
+
+class BenchmarkGroupSummaryRollupSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(read_only=True)
+    created_at = serializers.DateTimeField(source='start', read_only=True)
+    measurement = serializers.FloatField(source='geomean', read_only=True)
+
+    class Meta:
+        model = benchmarks_models.BenchmarkGroupSummaryRollup
+        fields = ('name', 'created_at', 'measurement', 'count', 'period')
+
+
+# Read-only serializers for rows read with QuerySet.values() (dicts) or
+# values_list() (tuples, in the order of lookups()). They produce the same
+# JSON as the ModelSerializers above without creating model instances or
+# going through DRF fields, which is what dominates large chart responses.
+
+def _text(value):
+    return six.text_type(value)
+
+
+def _datetime(value):
+    # same output as serializers.DateTimeField
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _floats(values):
+    return [float(v) for v in values]
+
+
+def _text_mapping(mapping):
+    return dict((six.text_type(k), six.text_type(v)) for k, v in mapping.items())
+
+
+class ValuesSerializer(object):
+    """
+    `fields` is a sequence of (name, lookup, conversion) tuples; `lookup` is
+    passed to values(), and `conversion` (if any) is applied to values that
+    are not None. Fields with no lookup are computed by a `get_<name>(row)`
+    method, which can use the lookups listed in `extra_lookups`.
+    """
+
+    fields = ()
+    extra_lookups = ()
+
+    def __init__(self, instance=None, many=False, context=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+        self.__lookups__ = self.lookups()
+
+    @classmethod
+    def lookups(cls):
+        lookups = [lookup for _, lookup, _ in cls.fields if lookup]
+        return lookups + [l for l in cls.extra_lookups if l not in lookups]
+
+    @classmethod
+    def values(cls, queryset, *extra):
+        return queryset.values(*(cls.lookups() + list(extra)))
+
+    def to_representation(self, row):
+        if not isinstance(row, dict):
+            row = dict(zip(self.__lookups__, row))
+        data = OrderedDict()
+        for name, lookup, conversion in self.fields:
+            if lookup is None:
+                data[name] = getattr(self, 'get_' + name)(row)
+                continue
+            value = row[lookup]
+            if value is not None and conversion is not None:
+                value = conversion(value)
+            data[name] = value
+        return data
+
+    @property
+    def data(self):
+        if self.many:
+            return list(self.iter_data())
+        return self.to_representation(self.instance)
+
+    def iter_data(self):
+        for row in self.instance:
+            yield self.to_representation(row)
+
+
+class ResultDataValuesSerializer(ValuesSerializer):
+    """ Same output as ResultDataSerializer. """
+
+    fields = (
+        ('id', 'id', None),
+        ('benchmark', 'benchmark__name', _text),
+        ('build_id', 'result__build_id', _text),
+        ('test_job_id', 'test_job_id', _text),
+        ('name', 'name', _text),
+        ('board', 'board', _text),
+        ('measurement', 'measurement', float),
+        ('stdev', 'stdev', float),
+        ('values', 'values', _floats),
+        ('created_at', 'created_at', _datetime),
+        ('result', 'result_id', None),
+    )
+
+
+# conversions of the values of model fields, by their internal type, to what
+# the ModelSerializer field for them outputs
+_CONVERSIONS = {
+    'CharField': _text,
+    'TextField': _text,
+    'BooleanField': bool,
+    'DateTimeField': _datetime,
+    'HStoreField': _text_mapping,
+}
+
+
+def _model_fields(model_serializer):
+    """
+    `fields` of a ValuesSerializer for `model_serializer`, a ModelSerializer
+    with no Meta.fields, in the order of its output: fields declared on it,
+    and file fields, have no lookup and need a `get_<name>` method; foreign
+    keys output the related primary key.
+    """
+    info = model_meta.get_field_info(model_serializer.Meta.model)
+    names = model_serializer().get_default_field_names(model_serializer._declared_fields, info)
+    fields = []
+    for name in names:
+        if name in model_serializer._declared_fields:
+            fields.append((name, None, None))
+        elif name in info.forward_relations:
+            fields.append((name, info.forward_relations[name].model_field.attname, None))
+        else:
+            field = info.pk if name == info.pk.name else info.fields[name]
+            field_type = field.get_internal_type()
+            if field_type == 'FileField':
+                fields.append((name, None, None))
+            else:
+                fields.append((name, name, _CONVERSIONS.get(field_type)))
+    return tuple(fields)
+
+
+class TestJobValuesSerializer(ValuesSerializer):
+    """ Same output as TestJobSerializer. """
+
+    fields = _model_fields(TestJobSerializer)
+    extra_lookups = ('data', 'status', 'resubmitted')
+
+    def get_can_resubmit(self, row):
+        return benchmarks_models.TestJob.is_resubmittable(row['id'], row['status'], row['resubmitted'])
+
+    def get_data_filetype(self, row):
+        if row['data'] is None:
+            return None
+        return row['data'].split('.')[-1]
+
+    def get_data(self, row):
+        # same as serializers.FileField
+        if not row['data']:
+            return None
+        storage = benchmarks_models.TestJob._meta.get_field('data').storage
+        url = storage.url(row['data'])
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class BenchmarkGroupSummaryValuesSerializer(ValuesSerializer):
+    """ Same output as BenchmarkGroupSummarySerializer. """
+
+    fields = (
+        ('id', 'id', None),
+        ('name', None, None),
+        ('result', 'result_id', _text),
+        ('build_id', 'result__build_id', _text),
+        ('measurement', 'measurement', float),
+        ('created_at', 'created_at', _datetime),
+    )
+
+    def get_name(self, row):
+        return "Geometric mean"
@@ -1,21 +1,37 @@
+import calendar
 import hashlib
 import json
+import math
+import shutil
+import tempfile
 from StringIO import StringIO
 from mock import patch
 
 from django_dynamic_fixture import G
 from django.contrib.auth.models import User
-from rest_framework.test import APITestCase
+from django.core.files.base import ContentFile
+from rest_framework.test import APITestCase, APITransactionTestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from dateutil.relativedelta import relativedelta
 
-from benchmarks import models
+from benchmarks import identity, ingestion, models
 from benchmarks.tests import get_file
+from benchmarks.ingestion import store_test_results
+from api import serializers
+from api.downsampling import lttb
+from api.renderers import JSONRenderer, iterencode
 
 
 from benchmarks.testing import MANIFEST, MINIMAL_XML
 
 
+def content(response):
+    if response.streaming:
+        return json.loads(b''.join(response.streaming_content))
+    return json.loads(response.content)
+
+
 class TestJobTests(APITestCase):
 
     def setUp(self):
@@ -131,6 +147,29 @@ class ResultTests(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data['id'], 123)
 
+    def test_benchmarks_compare(self):
+        manifest = G(models.Manifest, manifest=MINIMAL_XML)
+        environment = G(models.Environment, identifier='juno')
+        benchmark = G(models.Benchmark, name='load')
+        previous = G(models.Result, manifest=manifest, build_id=1)
+        current = G(models.Result, manifest=manifest, build_id=2)
+        before = G(models.TestJob, id='1', result=previous, environment=environment)
+        after = G(models.TestJob, id='2', result=current, environment=environment)
+        previous_data = G(models.ResultData, result=previous, test_job_id=before.id,
+                          benchmark=benchmark, name='load-avg', measurement=10)
+        current_data = G(models.ResultData, result=current, test_job_id=after.id,
+                         benchmark=benchmark, name='load-avg', measurement=15)
+
+        response = self.client.get('/api/result/%d/benchmarks_compare/?comparison_base=%d' % (current.id, previous.id))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['environment'], 'juno')
+        item = response.data[0]['data'][0]
+        self.assertAlmostEqual(item['change'], 50)
+        self.assertEqual(item['current'], serializers.ResultDataSerializer(current_data).data)
+        self.assertEqual(item['previous'], serializers.ResultDataSerializer(previous_data).data)
+
     @patch('benchmarks.tasks.update_jenkins.apply_async', lambda **kwargs: None)
     @patch('benchmarks.tasks.set_testjob_results.apply_async', lambda **kwargs: None)
     def test_post_1(self):
@@ -404,6 +443,61 @@ class ResultTests(APITestCase):
         self.assertEqual(models.Environment.objects.count(), 2)
         self.assertEqual(models.BenchmarkGroup.objects.count(), 3) # 2 + root
 
+    @patch.dict('django.conf.settings.CREDENTIALS', {'jenkins.linaro.org': ("hej", "ho")})
+    def test_post_same_testjob_results_again(self):
+        def post():
+            return self.client.post('/api/result/', data={
+                'build_url': 'http://jenkins.linaro.org/foo/bar/baz/1',
+                'name': u'linaro-art-stable-m-build-juno',
+                'url': u'http://dynamicfixture1.com',
+                'build_number': 200,
+                'build_id': 200,
+                'manifest': MINIMAL_XML,
+                'created_at': '2016-01-06 09:00:01',
+                'environment1.json': StringIO(json.dumps({
+                    "benchmarks": {
+                        "benchmarks/group1/foo.foo1": [1,2,2],
+                    }
+                })),
+            })
+
+        self.assertEqual(post().status_code, 201)
+        skipped = ingestion.duplicates.artifacts
+
+        with patch('benchmarks.testminer.ArtJenkinsTestResults.parse_test_results') as parse:
+            self.assertEqual(post().status_code, 201)
+            self.assertFalse(parse.called)
+
+        self.assertEqual(models.TestJob.objects.count(), 1)
+        self.assertEqual(models.ResultData.objects.count(), 1)
+        self.assertEqual(ingestion.duplicates.artifacts, skipped + 1)
+
+    @patch.dict('django.conf.settings.CREDENTIALS', {'jenkins.linaro.org': ("hej", "ho")})
+    def test_post_different_testjob_results_again(self):
+        def post(values):
+            return self.client.post('/api/result/', data={
+                'build_url': 'http://jenkins.linaro.org/foo/bar/baz/1',
+                'name': u'linaro-art-stable-m-build-juno',
+                'url': u'http://dynamicfixture1.com',
+                'build_number': 200,
+                'build_id': 200,
+                'manifest': MINIMAL_XML,
+                'created_at': '2016-01-06 09:00:01',
+                'environment1.json': StringIO(json.dumps({
+                    "benchmarks": {
+                        "benchmarks/group1/foo.foo1": values,
+                    }
+                })),
+            })
+
+        self.assertEqual(post([1, 2, 2]).status_code, 201)
+
+        with patch('benchmarks.testminer.ArtJenkinsTestResults.parse_test_results') as parse:
+            self.assertEqual(post([5, 5, 5]).status_code, 409)
+            self.assertFalse(parse.called)
+
+        self.assertEqual(models.ResultData.objects.get().values, [1, 2, 2])
+
 
     def test_baseline_1(self):
 
@@ -521,6 +615,63 @@ class ResultTests(APITestCase):
         self.assertEqual(response.data['id'], baseline.id)
 
 
+class ResultCreateIdentityTest(APITransactionTestCase):
+
+    def setUp(self):
+        user = User.objects.create_superuser('test', 'email@test.com', 'test')
+        self.client.force_authenticate(user=user)
+        identity.clear()
+
+    def tearDown(self):
+        identity.clear()
+
+    def post(self, build_id):
+        return self.client.post('/api/result/', data={
+            'build_url': 'http://jenkins.linaro.org/foo/bar/baz/%d' % build_id,
+            'name': u'linaro-art-stable-m-build-juno',
+            'url': u'http://dynamicfixture1.com',
+            'build_number': build_id,
+            'build_id': build_id,
+            'manifest': MINIMAL_XML,
+            'created_at': '2016-01-06 09:00:01',
+            'environment1.json': StringIO(json.dumps({
+                "benchmarks": {
+                    "benchmarks/group1/foo.foo1": [1, 2, 2],
+                }
+            })),
+        })
+
+    @patch.dict('django.conf.settings.CREDENTIALS', {'jenkins.linaro.org': ("hej", "ho")})
+    def test_caches_existing_environments(self):
+        # the first post creates the environment, inside its transaction
+        self.assertEqual(self.post(1).status_code, 201)
+        self.assertEqual(identity.environments.stats()['size'], 0)
+
+        # later ones find it committed, and cache it
+        self.assertEqual(self.post(2).status_code, 201)
+        self.assertEqual(identity.environments.stats()['size'], 1)
+        hits = identity.environments.hits
+        self.assertEqual(self.post(3).status_code, 201)
+        self.assertEqual(identity.environments.hits, hits + 1)
+        self.assertEqual(models.Environment.objects.count(), 1)
+
+    @patch.dict('django.conf.settings.CREDENTIALS', {'jenkins.linaro.org': ("hej", "ho")})
+    @patch('api.views.time.sleep')
+    @patch('benchmarks.identity.current_generation', return_value=0)
+    def test_retries_with_a_clear_cache(self, current_generation, sleep):
+        self.assertEqual(self.post(1).status_code, 201)
+        self.assertEqual(self.post(2).status_code, 201)
+        self.assertEqual(identity.environments.stats()['size'], 1)
+
+        # deleted by another process: this one is not told about it
+        with patch('benchmarks.identity.IdentityCache.invalidate'):
+            models.Environment.objects.all().delete()
+
+        self.assertEqual(self.post(3).status_code, 201)
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(models.Environment.objects.count(), 1)
+
+
 class ManifestTests(APITestCase):
 
     def setUp(self):
@@ -608,21 +759,21 @@ class StatsTest(APITestCase):
             'benchmark': 'TheBenchmark',
         })
 
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(content(response)), 0)
 
         response = self.client.get('/api/stats/', {
             'benchmark': 'TheBenchmark',
             'project': 'TheProject',
         })
 
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(content(response)), 0)
 
         response = self.client.get('/api/stats/', {
             'branch': 'master',
             'project': 'TheProject',
         })
 
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(content(response)), 0)
 
     @patch('django.conf.settings.IGNORE_GERRIT', False)
     def test_only_baseline_changes(self):
@@ -670,8 +821,9 @@ class StatsTest(APITestCase):
             'environment': 'myenv',
         })
 
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['measurement'], 5)
+        data = content(response)
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]['measurement'], 5)
 
     @patch('django.conf.settings.IGNORE_GERRIT', True)
     def test_only_baseline_changes_ignore_gerrit(self):
@@ -719,9 +871,101 @@ class StatsTest(APITestCase):
             'environment': 'myenv',
         })
 
-        self.assertEqual(len(response.data), 2)
-        self.assertEqual(response.data[0]['measurement'], 10)
-        self.assertEqual(response.data[1]['measurement'], 5)
+        data = content(response)
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data[0]['measurement'], 10)
+        self.assertEqual(data[1]['measurement'], 5)
+
+    @patch('django.conf.settings.IGNORE_GERRIT', False)
+    def test_series(self):
+        now = timezone.now()
+        environment = G(models.Environment, identifier='myenv')
+        benchmark = G(models.Benchmark, name="TheBenchmark")
+
+        for days, values in ((2, [1, 3]), (1, [4, 6])):
+            result = G(models.Result,
+                       manifest=MANIFEST(),
+                       branch_name='master',
+                       created_at=now - relativedelta(days=days),
+                       gerrit_change_number=None)
+            testjob = G(models.TestJob, environment=environment, result=result)
+            for name in ("a", "b"):
+                G(models.ResultData,
+                  result=result,
+                  benchmark=benchmark,
+                  test_job_id=testjob.id,
+                  name=name,
+                  created_at=result.created_at,
+                  values=values)
+
+        response = self.client.get('/api/stats/series/', {
+            'branch': 'master',
+            'benchmark': 'TheBenchmark',
+            'environment': 'myenv',
+        })
+
+        data = content(response)
+        self.assertEqual([(s['benchmark'], s['name']) for s in data],
+                         [('TheBenchmark', 'a'), ('TheBenchmark', 'b')])
+        self.assertEqual(data[0]['measurement'], [2, 5])
+        self.assertEqual(data[0]['stdev'], [1, 1])
+        self.assertEqual(data[0]['min'], [1, 4])
+        self.assertEqual(data[0]['max'], [3, 6])
+        self.assertEqual(len(data[0]['timestamp']), 2)
+        self.assertTrue(data[0]['timestamp'][0] < data[0]['timestamp'][1])
+
+
+class RollupTest(APITestCase):
+
+    def setUp(self):
+        user = User.objects.create_superuser('test', 'email@test.com', 'test')
+        self.client.force_authenticate(user=user)
+
+        environment = G(models.Environment, identifier='myenv')
+        self.start = timezone.now() - relativedelta(days=10)
+        for day in (1, 2, 3):
+            for hour in (1, 2):
+                date = self.start + relativedelta(days=day, hours=hour)
+                result = G(models.Result, manifest=MANIFEST(), branch_name='master',
+                           gerrit_change_number=None, created_at=date)
+                testjob = G(models.TestJob, result=result, environment=environment, created_at=date)
+                store_test_results(testjob, [{
+                    'benchmark_group': 'group/',
+                    'benchmark_name': 'TheBenchmark',
+                    'subscore': [{'name': 'sub', 'measurement': day}],
+                }])
+
+    def get(self, url, **params):
+        params.update({
+            'branch': 'master',
+            'environment': 'myenv',
+            'startDate': calendar.timegm(self.start.utctimetuple()),
+        })
+        return self.client.get(url, params)
+
+    @patch('django.conf.settings.IGNORE_GERRIT', False)
+    def test_stats_uses_daily_rollups(self):
+        response = self.get('/api/stats/', benchmark='TheBenchmark', max_points=3)
+        self.assertEqual([d['period'] for d in response.data], ['day'] * 3)
+        self.assertEqual([d['measurement'] for d in response.data], [3, 2, 1])
+
+    @patch('django.conf.settings.IGNORE_GERRIT', False)
+    def test_stats_uses_raw_data_when_it_fits(self):
+        response = self.get('/api/stats/', benchmark='TheBenchmark', max_points=6)
+        self.assertEqual(len(response.data), 6)
+        self.assertTrue('period' not in response.data[0])
+
+    @patch('django.conf.settings.IGNORE_GERRIT', False)
+    def test_series_uses_weekly_rollups(self):
+        response = self.get('/api/stats/series/', benchmark='TheBenchmark', max_points=1)
+        data = content(response)
+        self.assertEqual(len(data[0]['timestamp']), 1)
+        self.assertEqual(data[0]['result'], [None])
+
+    def test_benchmark_group_summary_uses_rollups(self):
+        response = self.get('/api/benchmark_group_summary/', benchmark_group='group/', max_points=3)
+        self.assertEqual([d['period'] for d in response.data], ['day'] * 3)
+        self.assertEqual([round(d['measurement'], 6) for d in response.data], [3, 2, 1])
 
 
 class BenchmarkGroupSummaryTest(APITestCase):
@@ -740,7 +984,7 @@ class BenchmarkGroupSummaryTest(APITestCase):
             'environment': env.identifier,
             'branch': result.branch_name,
         })
-        self.assertEqual(1, len(response.data))
+        self.assertEqual(1, len(content(response)))
 
     def test_returns_only_mainline_results(self):
         mainline_result = G(models.Result, manifest=MANIFEST(), branch_name='master', gerrit_change_number=None)
@@ -754,11 +998,88 @@ class BenchmarkGroupSummaryTest(APITestCase):
             'environment': env.identifier,
             'branch': 'master',
         })
-        self.assertEqual(1, len(response.data))
+        self.assertEqual(1, len(content(response)))
+
+    def test_max_points(self):
+        now = timezone.now()
+        result = G(models.Result, manifest=MANIFEST(), gerrit_change_number=None)
+        group = G(models.BenchmarkGroup)
+        env = G(models.Environment)
+        for i in range(20):
+            G(models.BenchmarkGroupSummary, group=group, environment=env, result=result,
+              created_at=now - relativedelta(days=i), log_sum=math.log(i % 5 + 1), count=1)
+        response = self.client.get('/api/benchmark_group_summary/', {
+            'benchmark_group': group.name,
+            'environment': env.identifier,
+            'branch': result.branch_name,
+            'max_points': 5,
+        })
+        self.assertEqual(5, len(response.data))
+        dates = [item['created_at'] for item in response.data]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+
+class DynamicBenchmarkSummaryTest(APITestCase):
+
+    def setUp(self):
+        user = User.objects.create_superuser('test', 'email@test.com', 'test')
+        self.client.force_authenticate(user=user)
+
+    @patch('django.conf.settings.IGNORE_GERRIT', False)
+    def test_geomean_per_result(self):
+        now = timezone.now()
+        env = G(models.Environment, identifier='myenv')
+        results = []
+        for days, values in ((2, ([1, 4], [2])), (1, ([3, 0], [])), (0, ([0], []))):
+            result = G(models.Result, manifest=MANIFEST(), branch_name='master',
+                       gerrit_change_number=None, created_at=now - relativedelta(days=days))
+            testjob = G(models.TestJob, environment=env, result=result)
+            for name, v in zip(('foo', 'bar'), values):
+                G(models.ResultData, result=result, test_job_id=testjob.id, benchmark__name=name,
+                  name=name, created_at=result.created_at, values=v)
+            results.append(result)
+
+        response = self.client.get('/api/dynamic_benchmark_summary/', {
+            'branch': 'master',
+            'environment': 'myenv',
+            'benchmarks': ['foo', 'bar'],
+        })
+
+        data = content(response)
+        self.assertEqual([d['result'] for d in data], [r.id for r in reversed(results)])
+        self.assertEqual(data[0]['measurement'], 0)
+        self.assertAlmostEqual(data[1]['measurement'], 3)
+        self.assertAlmostEqual(data[2]['measurement'], 2)
+        self.assertEqual(data[2]['name'], 'Summary')
+
+
+class DownsamplingTest(TestCase):
+
+    def test_keeps_first_and_last(self):
+        xs = range(100)
+        keep = lttb(xs, [x % 7 for x in xs], 10)
+        self.assertEqual(len(keep), 10)
+        self.assertEqual((keep[0], keep[-1]), (0, 99))
+        self.assertEqual(keep, sorted(keep))
+
+    def test_keeps_peak(self):
+        ys = [1] * 100
+        ys[42] = 100
+        self.assertTrue(42 in lttb(range(100), ys, 10))
+
+    def test_fewer_points_than_threshold(self):
+        self.assertEqual(list(lttb(range(5), range(5), 10)), range(5))
+
 
 class TestJobData(APITestCase):
 
     def setUp(self):
+        # a media root of its own, so that files stored by other tests do
+        # not change what gets stored (and how) here
+        self.media_root = tempfile.mkdtemp()
+        self.media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.media_settings.enable()
+
         self.testjob = G(
             models.TestJob,
             id="0001",
@@ -769,6 +1090,10 @@ class TestJobData(APITestCase):
         user = User.objects.create_superuser('test', 'email@test.com', 'test')
         self.client.force_authenticate(user=user)
 
+    def tearDown(self):
+        self.media_settings.disable()
+        shutil.rmtree(self.media_root)
+
     def test_download_json(self):
         self.testjob.data = get_file('now.json')
         self.testjob.save()
@@ -813,6 +1138,70 @@ class TestJobData(APITestCase):
         response = self.client.get('/api/testjobdata/0001')
         self.assertEqual(401, response.status_code)
 
+    def test_streams_whole_file(self):
+        self.testjob.data = get_file('now.json')
+        self.testjob.save()
+
+        response = self.client.get('/api/testjobdata/0001')
+
+        data = b''.join(response.streaming_content)
+        self.assertEqual(data, get_file('now.json').read())
+        self.assertEqual(str(len(data)), response['Content-Length'])
+        self.assertEqual('"%s"' % hashlib.sha256(data).hexdigest(), response['ETag'])
+
+    def test_range(self):
+        self.testjob.data = get_file('now.json')
+        self.testjob.save()
+        data = get_file('now.json').read()
+
+        response = self.client.get('/api/testjobdata/0001', HTTP_RANGE='bytes=2-5')
+        self.assertEqual(206, response.status_code)
+        self.assertEqual(data[2:6], b''.join(response.streaming_content))
+        self.assertEqual('bytes 2-5/%d' % len(data), response['Content-Range'])
+
+        response = self.client.get('/api/testjobdata/0001', HTTP_RANGE='bytes=-3')
+        self.assertEqual(data[-3:], b''.join(response.streaming_content))
+
+    def test_range_not_satisfiable(self):
+        self.testjob.data = get_file('now.json')
+        self.testjob.save()
+
+        response = self.client.get('/api/testjobdata/0001', HTTP_RANGE='bytes=100000-')
+        self.assertEqual(416, response.status_code)
+
+    def test_if_range_mismatch_serves_whole_file(self):
+        self.testjob.data = get_file('now.json')
+        self.testjob.save()
+
+        response = self.client.get('/api/testjobdata/0001', HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"foo"')
+        self.assertEqual(200, response.status_code)
+
+    def test_not_modified(self):
+        self.testjob.data = get_file('now.json')
+        self.testjob.save()
+        etag = self.client.get('/api/testjobdata/0001')['ETag']
+
+        response = self.client.get('/api/testjobdata/0001', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+
+    @patch('django.conf.settings.DOWNLOAD_SENDFILE_HEADER', 'X-Accel-Redirect')
+    @patch('django.conf.settings.TESTJOB_DATA_COMPRESS', False)
+    def test_accel_redirect(self):
+        # content no other test stores, so that it is not already compressed
+        self.testjob.data.save('data.json', ContentFile('{"accel": true}'))
+
+        response = self.client.get('/api/testjobdata/0001')
+        self.assertEqual('/protected/' + self.testjob.data.name, response['X-Accel-Redirect'])
+        self.assertEqual(b'', response.content)
+
+    @patch('django.conf.settings.DOWNLOAD_SENDFILE_HEADER', 'X-Accel-Redirect')
+    def test_compressed_files_are_streamed(self):
+        self.testjob.data.save('data.json', ContentFile('{"compressed": true}'))
+
+        response = self.client.get('/api/testjobdata/0001')
+        self.assertFalse(response.has_header('X-Accel-Redirect'))
+        self.assertEqual('{"compressed": true}', b''.join(response.streaming_content))
+
 
 class ManifestDataTest(APITestCase):
 
@@ -824,8 +1213,175 @@ class ManifestDataTest(APITestCase):
         m = G(models.Manifest, manifest=MINIMAL_XML)
         response = self.client.get('/api/manifest_data/%s/download/' % m.id)
 
-        self.assertEqual(MINIMAL_XML, response.content)
+        self.assertEqual(MINIMAL_XML, b''.join(response.streaming_content))
         self.assertEqual('text/xml', response['Content-Type'])
 
         disposition = 'attachment; filename="%s.xml"' % m.manifest_hash
         self.assertEqual(disposition, response['Content-Disposition'])
+
+    def test_not_modified(self):
+        m = G(models.Manifest, manifest=MINIMAL_XML)
+        response = self.client.get('/api/manifest_data/%s/download/' % m.id,
+                                   HTTP_IF_NONE_MATCH='"%s"' % m.manifest_hash)
+        self.assertEqual(304, response.status_code)
+
+
+class ResultDataForManifestTest(APITestCase):
+
+    def setUp(self):
+        user = User.objects.create_superuser('test', 'email@test.com', 'test')
+        self.client.force_authenticate(user=user)
+
+    def test_aggregates(self):
+        manifest = MANIFEST()
+        result = G(models.Result, manifest=manifest, branch_name='master',
+                   gerrit_change_number=None, gerrit_patchset_number=None)
+        benchmark = G(models.Benchmark, name='load')
+        for m in (1, 3):
+            G(models.ResultData, result=result, benchmark=benchmark, name='load-avg', measurement=m, values=[m])
+        G(models.ResultData, result=result, benchmark=benchmark, name='load-max', measurement=5, values=[5])
+
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/details/', {'manifest_id': manifest.id})
+
+        self.assertEqual(response.data['metadata']['branch'], 'master')
+        self.assertEqual(response.data['metadata']['manifest'], manifest.id)
+        self.assertEqual(response.data['metadata']['builds'], [result.build_url])
+        self.assertEqual(
+            [(d['subscore'], d['measurement__avg'], d['measurement__stddev'], d['measurement__count'])
+             for d in response.data['data']],
+            [('load-avg', 2, 1, 2), ('load-max', 5, 0, 1)],
+        )
+
+
+class CursorPaginationTest(APITestCase):
+
+    def setUp(self):
+        user = User.objects.create_superuser('test', 'email@test.com', 'test')
+        self.client.force_authenticate(user=user)
+
+    def walk(self, url):
+        ids = []
+        cursor = ''
+        while cursor is not None:
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.data['results'])
+            cursor = response.data['page']['next']
+        return ids
+
+    def test_results(self):
+        now = timezone.now()
+        for i in range(25):
+            # pairs of results created at the same time
+            G(models.Result, manifest=MANIFEST(), created_at=now - relativedelta(hours=i // 2))
+
+        ids = self.walk('/api/result/')
+
+        expected = models.Result.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_testjobs(self):
+        result = G(models.Result, manifest=MANIFEST())
+        for i in range(21):
+            G(models.TestJob, id='%d.0' % i, result=result)
+
+        ids = self.walk('/api/testjob/')
+
+        self.assertEqual(sorted(ids), sorted('%d.0' % i for i in range(21)))
+
+    def test_estimated_count(self):
+        G(models.Manifest, manifest=MINIMAL_XML)
+        response = self.client.get('/api/manifest/', {'cursor': ''})
+        self.assertTrue(isinstance(response.data['count'], int))
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_page_numbers_by_default(self):
+        G(models.Manifest, manifest=MINIMAL_XML)
+        response = self.client.get('/api/manifest/')
+        self.assertEqual(response.data['count'], 1)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/result/', {'cursor': 'foo'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ValuesSerializerTest(APITestCase):
+
+    def setUp(self):
+        user = User.objects.create_superuser('test', 'email@test.com', 'test')
+        self.client.force_authenticate(user=user)
+        self.result = G(models.Result, manifest=MANIFEST(), build_id=7)
+
+    def assertSameOutput(self, queryset, model_serializer, values_serializer):
+        expected = model_serializer(list(queryset), many=True).data
+        rows = list(values_serializer.values(queryset))
+        self.assertEqual(values_serializer(rows, many=True).data, expected)
+        tuples = list(queryset.values_list(*values_serializer.lookups()))
+        self.assertEqual(values_serializer(tuples, many=True).data, expected)
+
+    def test_result_data(self):
+        G(models.ResultData, result=self.result, values=[1, 2.5], stdev=None)
+        G(models.ResultData, result=self.result, values=[])
+
+        self.assertSameOutput(
+            models.ResultData.objects.order_by('id'),
+            serializers.ResultDataSerializer,
+            serializers.ResultDataValuesSerializer,
+        )
+
+    def test_testjob(self):
+        G(models.TestJob, id='1', result=self.result, status='Incomplete', data='foo/1.json', metadata={'a': 'b'})
+        G(models.TestJob, id='2.1', result=self.result, status='Incomplete', data=None, environment=None)
+        G(models.TestJob, id='3', result=self.result, status='Complete', data='', url=None)
+
+        self.assertSameOutput(
+            models.TestJob.objects.order_by('id'),
+            serializers.TestJobSerializer,
+            serializers.TestJobValuesSerializer,
+        )
+
+    def test_benchmark_group_summary(self):
+        G(models.BenchmarkGroupSummary, result=self.result, measurement=3)
+
+        self.assertSameOutput(
+            models.BenchmarkGroupSummary.objects.order_by('id'),
+            serializers.BenchmarkGroupSummarySerializer,
+            serializers.BenchmarkGroupSummaryValuesSerializer,
+        )
+
+    def test_list(self):
+        testjob = G(models.TestJob, id='1', result=self.result, data='foo/1.json')
+
+        response = self.client.get('/api/testjob/')
+
+        self.assertEqual(response.data['count'], 1)
+        self.assertTrue(response.data['results'][0]['data'].startswith('http://testserver/'))
+        self.assertTrue(response.data['results'][0]['data'].endswith('foo/1.json'))
+        self.assertEqual(response.data['results'][0]['id'], testjob.id)
+
+
+class JSONRenderingTest(TestCase):
+
+    def test_iterencode(self):
+        chunks = list(iterencode(({'n': i} for i in range(5)), chunk_size=2))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(json.loads(''.join(chunks)), [{'n': i} for i in range(5)])
+
+    def test_iterencode_empty(self):
+        self.assertEqual(''.join(iterencode([])), '[]')
+
+    def test_renderer(self):
+        data = {'name': u'\u00e7', 'created_at': timezone.now()}
+        rendered = JSONRenderer().render(data)
+        self.assertEqual(json.loads(rendered)['name'], u'\u00e7')
+
+    def test_annotations_are_streamed(self):
+        G(models.Result, manifest=MANIFEST(), annotation='foo')
+        User.objects.create_superuser('test', 'email@test.com', 'test')
+        self.client.login(username='test', password='test')
+
+        response = self.client.get('/api/annotations/')
+
+        self.assertTrue(response.streaming)
+        self.assertEqual([a['label'] for a in content(response)], ['foo'])
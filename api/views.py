@@ -1,14 +1,16 @@
-import json
+import calendar
+import hashlib
+import operator
 import re
 import urlparse
 import mimetypes
 
-mimetypes.init()
+from io import BytesIO
 
-from itertools import groupby
+mimetypes.init()
 
 from django.conf import settings
-from django.db import transaction, IntegrityError
+from django.db import connection, transaction, IntegrityError
 from django.db.models import Avg, StdDev, Count
 from django.http import HttpResponse
 from datetime import datetime
@@ -20,6 +22,7 @@ from rest_framework import response
 from rest_framework import mixins
 from rest_framework import status
 from rest_framework import filters
+from rest_framework import exceptions
 from rest_framework.decorators import detail_route, api_view
 from rest_framework.decorators import authentication_classes, permission_classes
 from rest_framework.authtoken.models import Token
@@ -28,12 +31,18 @@ from rest_framework.authentication import SessionAuthentication
 from rest_framework.decorators import list_route
 
 from benchmarks import models as benchmarks_models
-from benchmarks.models import geomean
-from benchmarks import tasks, testminer
-from benchmarks import progress
+from benchmarks import tasks, testminer, identity, ingestion
+from benchmarks import progress, rollups
 from benchmarks import comparison
 
-from . import serializers
+from . import downloads, serializers
+from .downsampling import downsample, lttb
+from .renderers import StreamingJSONResponse
+
+
+class ResultsConflict(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Different results were already loaded for this test job.'
 
 
 # no statistics module in Python 2
@@ -76,6 +85,7 @@ class ManifestViewSet(viewsets.ReadOnlyModelViewSet):
                 .prefetch_related("results"))
 
     serializer_class = serializers.ManifestSerializer
+    cursor_ordering = ('-id',)
 
     filter_backends = (filters.SearchFilter, filters.DjangoFilterBackend)
     search_fields = ('manifest_hash', 'reduced__hash')
@@ -88,9 +98,15 @@ class ManifestDataViewSet(viewsets.ReadOnlyModelViewSet):
     @detail_route()
     def download(self, request, pk=None):
         manifest = self.get_object()
-        response = HttpResponse(manifest.manifest, content_type='text/xml')
-        response['Content-Disposition'] = 'attachment; filename="%s.xml"' % manifest.manifest_hash
-        return response
+        data = manifest.manifest.encode('utf-8')
+        return downloads.serve(
+            request,
+            BytesIO(data),
+            len(data),
+            manifest.manifest_hash,
+            'text/xml',
+            '%s.xml' % manifest.manifest_hash,
+        )
 
 class ManifestReducedViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [DjangoModelPermissions]
@@ -132,6 +148,21 @@ def get_limit(request):
     return n
 
 
+def get_max_points(request):
+    try:
+        n = int(request.query_params.get('max_points'))
+    except (TypeError, ValueError):
+        n = None
+    if n <= 0:
+        n = None
+    return n
+
+
+def timestamp(date):
+    # milliseconds since the epoch, as used by Highcharts
+    return calendar.timegm(date.utctimetuple()) * 1000 + date.microsecond // 1000
+
+
 def get_date_range(request):
     if get_limit(request):
         return None
@@ -148,13 +179,40 @@ def get_date_range(request):
         return None
 
 
-class StatsViewSet(viewsets.ModelViewSet):
+class ValuesListMixin(object):
+    """
+    Serves list() through `values_serializer_class` when it is set: rows are
+    read with values() and serialized without creating model instances. The
+    output is the same as with `serializer_class`, which is still used for
+    everything else. Unpaginated lists are streamed.
+    """
+
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.values_serializer_class is None:
+            return super(ValuesListMixin, self).list(request, *args, **kwargs)
+
+        queryset = self.values_serializer_class.values(self.filter_queryset(self.get_queryset()))
+        context = self.get_serializer_context()
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.values_serializer_class(page, many=True, context=context)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.values_serializer_class(queryset.iterator(), many=True, context=context)
+        return StreamingJSONResponse(serializer.iter_data())
+
+
+class StatsViewSet(ValuesListMixin, viewsets.ModelViewSet):
     queryset = (benchmarks_models.ResultData.objects
                 .select_related("benchmark", "result")
                 .order_by('created_at'))
 
     permission_classes = [DjangoModelPermissions]
     serializer_class = serializers.ResultDataSerializer
+    values_serializer_class = serializers.ResultDataValuesSerializer
     pagination_class = None
     __queryset__ = None
 
@@ -192,11 +250,138 @@ class StatsViewSet(viewsets.ModelViewSet):
         self.__queryset__ = queryset.order_by('-created_at')[:n]
         return self.__queryset__
 
+    def get_rollups(self):
+        """
+        Daily or weekly rollups to chart instead of the raw data, when both a
+        date range and max_points are given and the raw data would not fit.
+        Rollups only cover baseline builds.
+        """
+        max_points = get_max_points(self.request)
+        dates = get_date_range(self.request)
+        branch = self.request.query_params.get('branch')
+        environment = self.request.query_params.get('environment')
+        benchmarks = self.request.query_params.getlist('benchmark')
+
+        if not (max_points and dates and benchmarks and branch and environment):
+            return None
+        if settings.IGNORE_GERRIT is not False:
+            return None
+
+        queryset = rollups.in_range(
+            benchmarks_models.ResultDataRollup.objects.filter(
+                branch_name=branch,
+                environment__identifier=environment,
+                benchmark__name__in=benchmarks,
+            ),
+            dates.get('created_at__gt'),
+            dates.get('created_at__lt'),
+        )
+        period = rollups.choose_period(queryset, ('benchmark_id', 'name'), max_points)
+        if period is None:
+            return None
+        return queryset.filter(period=period).select_related('benchmark').order_by('-start')
+
+    def list(self, request, *args, **kwargs):
+        max_points = get_max_points(request)
+        if not max_points:
+            return super(StatsViewSet, self).list(request, *args, **kwargs)
+
+        rows = self.get_rollups()
+        if rows is None:
+            rows = self.values_serializer_class.values(self.get_queryset(), 'benchmark_id')
+            serializer_class = self.values_serializer_class
+            get = operator.getitem
+            date, measurement = 'created_at', 'measurement'
+        else:
+            serializer_class = serializers.ResultDataRollupSerializer
+            get = getattr
+            date, measurement = 'start', 'mean'
+        x = lambda r: timestamp(get(r, date))
+        y = lambda r: get(r, measurement)
+
+        # each subscore is a separate line in the chart
+        series = {}
+        rows = list(rows)
+        for r in rows:
+            series.setdefault((get(r, 'benchmark_id'), get(r, 'name')), []).append(r)
+        keep = set()
+        for points in series.values():
+            keep.update(get(r, 'id') for r in downsample(points, max_points, x, y))
+
+        serializer = serializer_class([r for r in rows if get(r, 'id') in keep], many=True)
+        return response.Response(serializer.data)
+
+    @list_route()
+    def series(self, request):
+        """
+        Same data as the list, but as one set of column arrays per
+        (benchmark, subscore), in chronological order. Raw rows are read with
+        values_list(), so no model instances are created for them.
+        """
+        rollup_rows = self.get_rollups()
+        if rollup_rows is None:
+            raw = self.get_queryset().values_list(
+                'benchmark__name',
+                'name',
+                'created_at',
+                'result_id',
+                'result__build_id',
+                'measurement',
+                'stdev',
+                'values',
+            )
+            rows = (
+                (benchmark, name, created_at, result_id, build_id, measurement, stdev,
+                 min(values) if values else measurement,
+                 max(values) if values else measurement)
+                for benchmark, name, created_at, result_id, build_id, measurement, stdev, values
+                in reversed(list(raw))
+            )
+        else:
+            rows = (
+                (r.benchmark.name, r.name, r.start, None, None, r.mean, r.stdev, r.minimum, r.maximum)
+                for r in reversed(list(rollup_rows))
+            )
 
-class BenchmarkGroupSummaryViewSet(viewsets.ModelViewSet):
+        series = {}
+        for benchmark, name, created_at, result_id, build_id, measurement, stdev, minimum, maximum in rows:
+            key = (benchmark, name)
+            if key not in series:
+                series[key] = {
+                    'benchmark': benchmark,
+                    'name': name,
+                    'timestamp': [],
+                    'result': [],
+                    'build_id': [],
+                    'measurement': [],
+                    'stdev': [],
+                    'min': [],
+                    'max': [],
+                }
+            columns = series[key]
+            columns['timestamp'].append(timestamp(created_at))
+            columns['result'].append(result_id)
+            columns['build_id'].append(build_id)
+            columns['measurement'].append(measurement)
+            columns['stdev'].append(stdev)
+            columns['min'].append(minimum)
+            columns['max'].append(maximum)
+
+        max_points = get_max_points(request)
+        if max_points:
+            for columns in series.values():
+                keep = lttb(columns['timestamp'], columns['measurement'], max_points)
+                for name in ('timestamp', 'result', 'build_id', 'measurement', 'stdev', 'min', 'max'):
+                    columns[name] = [columns[name][i] for i in keep]
+
+        return StreamingJSONResponse(series[key] for key in sorted(series.keys()))
+
+
+class BenchmarkGroupSummaryViewSet(ValuesListMixin, viewsets.ModelViewSet):
     queryset = benchmarks_models.BenchmarkGroupSummary.objects.filter(result__gerrit_change_number=None).order_by('created_at')
     permission_classes = [DjangoModelPermissions]
     serializer_class = serializers.BenchmarkGroupSummarySerializer
+    values_serializer_class = serializers.BenchmarkGroupSummaryValuesSerializer
     pagination_class = None
 
     def get_queryset(self):
@@ -218,6 +403,45 @@ class BenchmarkGroupSummaryViewSet(viewsets.ModelViewSet):
 
         return queryset[:n]
 
+    def get_rollups(self):
+        """
+        Daily or weekly rollups to chart instead of the raw summaries; see
+        StatsViewSet.get_rollups.
+        """
+        max_points = get_max_points(self.request)
+        dates = get_date_range(self.request)
+        if not (max_points and dates):
+            return None
+
+        queryset = rollups.in_range(
+            benchmarks_models.BenchmarkGroupSummaryRollup.objects.filter(
+                environment__identifier=self.request.query_params.get('environment'),
+                group__name=self.request.query_params.get('benchmark_group'),
+                branch_name=self.request.query_params.get('branch'),
+            ),
+            dates.get('created_at__gt'),
+            dates.get('created_at__lt'),
+        )
+        period = rollups.choose_period(queryset, ('group_id',), max_points)
+        if period is None:
+            return None
+        return queryset.filter(period=period).order_by('-start')
+
+    def list(self, request, *args, **kwargs):
+        max_points = get_max_points(request)
+        if not max_points:
+            return super(BenchmarkGroupSummaryViewSet, self).list(request, *args, **kwargs)
+
+        rows = self.get_rollups()
+        if rows is None:
+            rows = self.values_serializer_class.values(self.get_queryset())
+            rows = downsample(list(rows), max_points, lambda s: timestamp(s['created_at']), lambda s: s['measurement'])
+            serializer = self.values_serializer_class(rows, many=True)
+        else:
+            rows = downsample(list(rows), max_points, lambda r: timestamp(r.start), lambda r: r.geomean)
+            serializer = serializers.BenchmarkGroupSummaryRollupSerializer(rows, many=True)
+        return response.Response(serializer.data)
+
 
 @api_view(["GET"])
 def dynamic_benchmark_summary(request):
@@ -236,7 +460,6 @@ def dynamic_benchmark_summary(request):
     n = get_limit(request)
 
     queryset = (benchmarks_models.ResultData.objects
-                .select_related("benchmark", "result")
                 .filter(
                     test_job_id__in=testjob_ids,
                     benchmark__name__in=benchmarks,
@@ -253,21 +476,32 @@ def dynamic_benchmark_summary(request):
         n = n * len(benchmarks)
         queryset = queryset[:n]
 
-    data = []
-    for result_id, result_data in groupby(queryset, lambda rd: rd.result_id):
-        values = []
-        for r in result_data:
-            created_at = r.created_at
-            values = values + r.values
-        data.append({
+    # geometric mean of all values per result, as exp(avg(ln(x))), computed
+    # by the database; zeros and negatives are discarded, as in geomean()
+    rows, params = queryset.values('result_id', 'created_at', 'values').query.sql_with_params()
+    sql = """
+        SELECT rd.result_id,
+               MIN(rd.created_at),
+               COALESCE(EXP(AVG(CASE WHEN v.value > 0 THEN LN(v.value) END)), 0)
+        FROM (%s) rd
+        LEFT JOIN LATERAL unnest(rd."values") AS v(value) ON true
+        GROUP BY rd.result_id
+        ORDER BY MAX(rd.created_at) DESC
+    """ % rows
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    return StreamingJSONResponse(
+        {
             'result': result_id,
             'created_at': created_at.isoformat(),
-            'measurement': geomean(values),
+            'measurement': measurement,
             'name': 'Summary',
-        })
-
-    response = HttpResponse(json.dumps(data), content_type='application/json')
-    return response
+        }
+        for result_id, created_at, measurement in rows
+    )
 
 
 @api_view(["GET"])
@@ -281,14 +515,10 @@ def annotations(request):
     if limit:
         results = results[:limit]
 
-    data = []
-    for r in results.values('created_at', 'annotation'):
-        r['date'] = r.pop('created_at').isoformat()
-        r['label'] = r.pop('annotation')
-        data.append(r)
-
-    response = HttpResponse(json.dumps(data), content_type='application/json')
-    return response
+    return StreamingJSONResponse(
+        {'date': created_at.isoformat(), 'label': annotation}
+        for created_at, annotation in results.values_list('created_at', 'annotation').iterator()
+    )
 
 
 @api_view(["POST"])
@@ -308,6 +538,7 @@ class ResultViewSet(viewsets.ModelViewSet):
                 .select_related('manifest')
                 .prefetch_related('test_jobs'))
     serializer_class = serializers.ResultSerializer
+    cursor_ordering = ('-created_at', '-id')
 
     filter_backends = (filters.SearchFilter, filters.DjangoFilterBackend)
     search_fields = ('branch_name',
@@ -342,14 +573,14 @@ class ResultViewSet(viewsets.ModelViewSet):
     def benchmarks(self, request, pk=None):
         result = self.get_object()
         test_jobs = result.test_jobs.prefetch_related('environment').all()
-        result_data = result.data.prefetch_related('benchmark').all()
+        result_data = serializers.ResultDataValuesSerializer.values(result.data.all())
 
         data = []
         for test_job in test_jobs:
-            rdata = [ r for r in result_data if r.test_job_id == test_job.id ]
+            rdata = [ r for r in result_data if r['test_job_id'] == test_job.id ]
             data.append({
                 "environment": test_job.environment and test_job.environment.identifier,
-                "data": serializers.ResultDataSerializer(rdata, many=True).data
+                "data": serializers.ResultDataValuesSerializer(rdata, many=True).data
             })
 
         return response.Response(data)
@@ -368,16 +599,20 @@ class ResultViewSet(viewsets.ModelViewSet):
         def __get_key(item):
             return item['change']
 
+        values_serializer = serializers.ResultDataValuesSerializer()
+
+        def __rows(testjob):
+            return values_serializer.values(testjob.result_data.all(), 'benchmark_id')
+
         data = []
         for item in progress.get_progress_between_results(result, previous):
             data_list = []
-            for data_item in comparison.compare(item.before, item.after):
+            pairs = comparison.compare_results(__rows(item.before), __rows(item.after), dict.get)
+            for data_item in pairs:
                 data_list.append({
                     'change': data_item['change'],
-                    'current': serializers.ResultDataSerializer(
-                        data_item['current']).data,
-                    'previous': serializers.ResultDataSerializer(
-                        data_item['previous']).data,
+                    'current': values_serializer.to_representation(data_item['current']),
+                    'previous': values_serializer.to_representation(data_item['previous']),
                 })
             res = {
                 "environment": item.environment.identifier,
@@ -393,6 +628,9 @@ class ResultViewSet(viewsets.ModelViewSet):
             try:
                 return self.__create__(request, *args, **kwargs)
             except IntegrityError:
+                # a cached benchmark or group id may have been deleted by
+                # another process; start over from the database
+                identity.clear()
                 attempts = attempts + 1
                 time.sleep(0.5)
                 if attempts >= 10:
@@ -446,31 +684,62 @@ class ResultViewSet(viewsets.ModelViewSet):
         return response.Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def __create_test_job__(self, result, env, data):
-        environment, _ = benchmarks_models.Environment.objects.get_or_create(identifier=env)
+        environment_id = identity.environments.get_id(env)
         spl = urlparse.urlsplit(result.build_url)
         runnerurl = "%s://%s/job/%s/%s/" % (spl.scheme, spl.netloc, result.name, result.build_number)
-        testjob = benchmarks_models.TestJob.objects.create(
-            id='J' + str(result.build_id) + '_' + result.name + '_' + env,
-            result=result,
-            status='Complete',
-            initialized=True,
-            completed=True,
-            data=data,
-            testrunnerclass='ArtJenkinsTestResults',
-            testrunnerurl=runnerurl,
-            environment=environment,
-            created_at=result.created_at,
-        )
+        testjob_id = 'J' + str(result.build_id) + '_' + result.name + '_' + env
+
+        testjob = benchmarks_models.TestJob.objects.filter(pk=testjob_id).first()
+        if testjob is None:
+            testjob = benchmarks_models.TestJob.objects.create(
+                id=testjob_id,
+                result=result,
+                status='Complete',
+                initialized=True,
+                completed=True,
+                data=data,
+                testrunnerclass='ArtJenkinsTestResults',
+                testrunnerurl=runnerurl,
+                environment_id=environment_id,
+                created_at=result.created_at,
+            )
+        elif testjob.results_loaded:
+            if self.__same_content__(testjob.data, data):
+                # posted again: nothing to parse or store
+                ingestion.duplicates.add(testjob)
+                return
+            # store_testjob_data keeps loaded results: don't silently drop
+            # these ones
+            raise ResultsConflict('Different results were already loaded for test job %s.' % testjob_id)
+        else:
+            # a previous attempt did not get to load the results
+            testjob.data = data
+            testjob.save()
+
         testrunner = testjob.get_tester()
-        json_data = testjob.data.read()
+        data.seek(0)
+        json_data = data.read()
         test_results = testrunner.parse_test_results(json_data)
         tasks.store_testjob_data(testjob, test_results)
 
+    def __same_content__(self, stored, data):
+        if not stored:
+            return False
+        digest = hashlib.sha256()
+        for chunk in data.chunks():
+            digest.update(chunk)
+        try:
+            return downloads.file_etag(stored) == digest.hexdigest()
+        except (IOError, OSError):
+            return False
+
 
-class TestJobViewSet(viewsets.ModelViewSet):
+class TestJobViewSet(ValuesListMixin, viewsets.ModelViewSet):
     permission_classes = [DjangoModelPermissions]
     queryset = benchmarks_models.TestJob.objects.all()
     serializer_class = serializers.TestJobSerializer
+    values_serializer_class = serializers.TestJobValuesSerializer
+    cursor_ordering = ('-created_at', '-id')
 
     lookup_value_regex = "[^/]+"  # LAVA ids are 000.0
 
@@ -527,8 +796,7 @@ class TestJobViewSet(viewsets.ModelViewSet):
 def download_testjob_data(request, testjob_id):
     testjob = benchmarks_models.TestJob.objects.get(pk=testjob_id)
 
-    content_type, _ = mimetypes.guess_type(testjob.data.path)
-    data = testjob.data.read()
+    content_type, _ = mimetypes.guess_type(testjob.data.name)
 
     if testjob.id.endswith('.' + testjob.data_filetype):
         filename = testjob.id
@@ -538,15 +806,30 @@ def download_testjob_data(request, testjob_id):
     if content_type is None:
         content_type = 'application/octet-stream'
 
-    response = HttpResponse(data, content_type=content_type)
-    response['Content-Disposition'] = 'attachment; filename="%s"' % filename
-    return response
-
-
-class ResultDataViewSet(viewsets.ModelViewSet):
+    try:
+        stored = (testjob.data.path, testjob.data.name)
+    except NotImplementedError:
+        # not in the local file system
+        stored = None
+
+    etag = downloads.file_etag(testjob.data)
+    testjob.data.open('rb')
+    return downloads.serve(
+        request,
+        testjob.data,
+        testjob.data.size,
+        etag,
+        content_type,
+        filename,
+        stored,
+    )
+
+
+class ResultDataViewSet(ValuesListMixin, viewsets.ModelViewSet):
     permission_classes = (IsAuthenticated, DjangoModelPermissions)
     queryset = benchmarks_models.ResultData.objects.all()
     serializer_class = serializers.ResultDataSerializer
+    values_serializer_class = serializers.ResultDataValuesSerializer
     filter_fields = ('id',
                      'benchmark',
                      'name',
@@ -567,11 +850,6 @@ class ResultDataForManifest(views.APIView):
         gerrit_change_number = self.request.query_params.get('gerrit_change_number', None)
         gerrit_patchset_number = self.request.query_params.get('gerrit_patchset_number', None)
 
-        print manifest
-        print gerrit_change_id
-        print gerrit_change_number
-        print gerrit_patchset_number
-
         results = benchmarks_models.Result.objects.all()
         if manifest:
             results = results.filter(manifest__id=manifest)
@@ -589,7 +867,6 @@ class ResultDataForManifest(views.APIView):
 
         # All result data that matches manifest and/or gerrit
         queryset = queryset.filter(result__in=results)
-        print queryset.all()
         return queryset
 
     def get(self, request, format=None):
@@ -600,45 +877,54 @@ class ResultDataForManifest(views.APIView):
             "metadata": metadata
         }
         queryset = self.get_queryset()
-        results_objects = benchmarks_models.Result.objects.filter(data__in=queryset)
-        branches = results_objects.values_list("branch__name").distinct()
+
+        # all metadata from a single query over the matching results
+        results_objects = benchmarks_models.Result.objects.filter(
+            pk__in=queryset.values('result_id')
+        ).values_list(
+            'branch_name',
+            'manifest_id',
+            'build_url',
+            'gerrit_change_number',
+            'gerrit_patchset_number',
+        ).distinct()
+        branches, manifests, build_urls, gerrit_change_numbers, gerrit_patchset_numbers = [
+            sorted(set(column)) for column in zip(*results_objects)
+        ] or [[]] * 5
+
         if len(branches) == 1:
             # there should be only one
-            metadata['branch'] = branches[0][0]
-        manifests = results_objects.values_list("manifest__id").distinct()
+            metadata['branch'] = branches[0]
         if len(manifests) == 1:
             # there should be only one
-            metadata['manifest'] = manifests[0][0]
-        boards = results_objects.values_list("board__displayname").distinct()
-        metadata['boards'] = [x[0] for x in boards]
-        build_urls = results_objects.values_list("build_url").distinct()
-        metadata['builds'] = [x[0] for x in build_urls]
-
-        gerrit_change_numbers = results_objects.values_list("gerrit_change_number").distinct()
-        gerrit_patchset_numbers = results_objects.values_list("gerrit_patchset_number").distinct()
+            metadata['manifest'] = manifests[0]
+        boards = queryset.order_by('board').values_list('board', flat=True).distinct()
+        metadata['boards'] = list(boards)
+        metadata['builds'] = build_urls
+
         if len(gerrit_patchset_numbers) == 1 and \
             len(gerrit_change_numbers) == 1:
-                if gerrit_patchset_numbers[0][0] is not None and \
-                    gerrit_change_numbers[0][0] is not None:
-                    metadata['gerrit'] = "%s/%s" % (gerrit_change_numbers[0][0], gerrit_patchset_numbers[0][0])
-
-        benchmark_name_list = queryset.values_list('benchmark__name').distinct()
-        for benchmark in benchmark_name_list:
-            res_list = queryset.filter(benchmark__name=benchmark[0])
-            subscore_name_list = res_list.values_list('name').distinct()
-            for subscore in subscore_name_list:
-                s = res_list.filter(name=subscore[0])
-                avg = s.aggregate(Avg('measurement'))
-                stddev = s.aggregate(StdDev('measurement'))
-                length = s.aggregate(Count('measurement'))
-                subscore_dict = {
-                    'benchmark': benchmark[0],
-                    'subscore': subscore[0]
-                    }
-                subscore_dict.update(avg)
-                subscore_dict.update(stddev)
-                subscore_dict.update(length)
-                results.append(subscore_dict)
+                if gerrit_patchset_numbers[0] is not None and \
+                    gerrit_change_numbers[0] is not None:
+                    metadata['gerrit'] = "%s/%s" % (gerrit_change_numbers[0], gerrit_patchset_numbers[0])
+
+        # avg, stddev and count for every (benchmark, subscore) at once
+        subscores = queryset.order_by('benchmark__name', 'name').values(
+            'benchmark__name',
+            'name',
+        ).annotate(
+            Avg('measurement'),
+            StdDev('measurement'),
+            Count('measurement'),
+        )
+        for subscore in subscores:
+            results.append({
+                'benchmark': subscore['benchmark__name'],
+                'subscore': subscore['name'],
+                'measurement__avg': subscore['measurement__avg'],
+                'measurement__stddev': subscore['measurement__stddev'],
+                'measurement__count': subscore['measurement__count'],
+            })
         return response.Response(ret)
 
 
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.utils import timezone
 
 from .models import Manifest, Result, ResultData, TestJob, Environment, Benchmark, BenchmarkGroup
 from .tasks import set_testjob_results
@@ -25,6 +26,8 @@ class TestJobAdmin(admin.ModelAdmin):
             testjob.initialized = False
             testjob.completed = False
             testjob.results_loaded = False
+            testjob.next_poll_at = timezone.now()
+            testjob.poll_attempts = 0
             testjob.save()
             set_testjob_results.delay(testjob.id)
     force_fetch_results.short_description = "Force fetch results"
@@ -0,0 +1,62 @@
+"""
+On-disk cache of LAVA dashboard bundles, which never change once submitted,
+keyed by their SHA1 (see BUNDLE_CACHE_DIR).
+"""
+
+import logging
+import os
+import re
+
+from django.conf import settings
+
+from benchmarks import diskcache
+
+
+logger = logging.getLogger("tasks")
+
+SHA1_RE = re.compile(r'^[0-9a-fA-F]+$')
+
+
+def bundle_path(sha1):
+    cache_dir = settings.BUNDLE_CACHE_DIR
+    if not cache_dir or not SHA1_RE.match(sha1 or ''):
+        return None
+    sha1 = sha1.lower()
+    return os.path.join(cache_dir, sha1[:2], sha1)
+
+
+def get(sha1):
+    """
+    Returns the content of the bundle, or None if it is not cached.
+    """
+    path = bundle_path(sha1)
+    if path is None:
+        return None
+    content = diskcache.read(path)
+    if content is None:
+        return None
+    return content.decode('utf-8')
+
+
+def put(sha1, content):
+    """
+    Stores the content of the bundle. Failing to do so (e.g. the disk is
+    full) is not an error: the bundle will just be downloaded again.
+    """
+    path = bundle_path(sha1)
+    if path is None:
+        return
+    try:
+        diskcache.write(path, content.encode('utf-8'))
+    except (IOError, OSError) as ex:
+        logger.warning("Could not cache bundle %s: %s" % (sha1, ex))
+
+
+def evict():
+    """
+    Removes the least recently used bundles until the cache takes at most
+    BUNDLE_CACHE_SIZE bytes. Returns the number of bundles removed.
+    """
+    if not settings.BUNDLE_CACHE_DIR:
+        return 0
+    return diskcache.evict(settings.BUNDLE_CACHE_DIR, settings.BUNDLE_CACHE_SIZE)
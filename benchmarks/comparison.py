@@ -1,13 +1,20 @@
+import hashlib
 import json
+import logging
 import os
-import shutil
 import subprocess
-import tempfile
 
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
+from multiprocessing.pool import ThreadPool
 
 from django.conf import settings
 
+from benchmarks import diskcache
+from benchmarks.storage import local_copy
+
+
+logger = logging.getLogger("tasks")
+
 compare_script = os.getenv('COMPARE_SCRIPT', None)
 compare_command = [compare_script]
 if not compare_script:
@@ -18,24 +25,137 @@ if not compare_script:
 
 def render_comparison(testjob_before, testjob_after):
     # FIXME: sandbox this!
-    compare_files = [testjob_before.data.file.name,
-                     testjob_after.data.file.name]
-    output = subprocess.check_output(compare_command + compare_files,
-                                     stderr=subprocess.STDOUT)
+    with local_copy(testjob_before.data) as before, local_copy(testjob_after.data) as after:
+        output = subprocess.check_output(compare_command + [before, after],
+                                         stderr=subprocess.STDOUT)
     return output
 
+
+def _digest(f, h=None):
+    h = h or hashlib.sha256()
+    for chunk in iter(lambda: f.read(65536), b''):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def _checkout_revision(directory):
+    # the commit checked out in `directory`, or else a hash of the Python
+    # modules in it, which the compare script may import
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=directory,
+                                       stderr=subprocess.STDOUT).strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    h = hashlib.sha256()
+    for parent, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith('.py'):
+                path = os.path.join(parent, filename)
+                h.update(path)
+                try:
+                    with open(path, 'rb') as f:
+                        _digest(f, h)
+                except IOError:
+                    pass
+    return h.hexdigest()
+
+
+def compare_script_revision():
+    """
+    Identifies what the compare script outputs for given data files: the
+    script itself, the checkout it lives in, and its arguments.
+    """
+    h = hashlib.sha256()
+    try:
+        with open(compare_script, 'rb') as f:
+            h.update(_digest(f))
+    except IOError:
+        h.update(compare_script)
+    h.update(_checkout_revision(os.path.dirname(os.path.abspath(compare_script))))
+    h.update('\0'.join(compare_command[1:]))
+    return h.hexdigest()
+
+
+def comparison_key(testjob_before, testjob_after, revision=None):
+    # content-addressed: the same two data files compared by the same
+    # compare script always produce the same output
+    h = hashlib.sha256()
+    h.update(revision or compare_script_revision())
+    for testjob in (testjob_before, testjob_after):
+        # a new file object, as the same test job may be in several pairs
+        f = testjob.data.storage.open(testjob.data.name, 'rb')
+        try:
+            h.update(_digest(f))
+        finally:
+            f.close()
+    return h.hexdigest()
+
+
+def cached_render_comparison(testjob_before, testjob_after, revision=None):
+    cache_dir = settings.COMPARISON_CACHE_DIR
+    if not cache_dir:
+        return render_comparison(testjob_before, testjob_after)
+
+    key = comparison_key(testjob_before, testjob_after, revision)
+    path = os.path.join(cache_dir, key[:2], key)
+    output = diskcache.read(path)
+    if output is not None:
+        return output
+
+    output = render_comparison(testjob_before, testjob_after)
+    try:
+        diskcache.write(path, output)
+    except (IOError, OSError) as ex:
+        # the output is good anyway, it just has to be rendered again next time
+        logger.warning("Could not cache comparison %s: %s" % (key, ex))
+    return output
+
+
+def render_comparisons(pairs):
+    """
+    Renders the comparison of each (testjob_before, testjob_after) pair,
+    returning the outputs in the same order. Each comparison runs the
+    compare script in its own process; at most COMPARISON_WORKERS of them run
+    at the same time.
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return []
+    revision = compare_script_revision()
+    render = lambda pair: cached_render_comparison(pair[0], pair[1], revision)
+    pool = ThreadPool(min(settings.COMPARISON_WORKERS, len(pairs)))
+    try:
+        return pool.map(render, pairs)
+    finally:
+        pool.close()
+        pool.join()
+
+
 def compare(testjob_before, testjob_after):
+    return compare_results(testjob_before.result_data.all(),
+                           testjob_after.result_data.all())
+
+
+def compare_results(previous_results, current_results, get=getattr):
+    """
+    Pairs each current result with the previous result of the same benchmark
+    and name, when there is exactly one. Results are ResultData objects, or
+    values() rows (including benchmark_id) when `get` is dict.get.
+    """
     result = []
-    current_results = testjob_after.result_data.all()
-    previous_results = testjob_before.result_data.all()
+
+    # hash join on (benchmark, subscore name) instead of scanning the
+    # previous results for every current one
+    previous_by_key = defaultdict(list)
+    for previous in previous_results:
+        previous_by_key[(get(previous, 'benchmark_id'), get(previous, 'name'))].append(previous)
+
     for current in current_results:
-        __previous__ = [
-            r for r in previous_results
-            if r.benchmark_id == current.benchmark_id and r.name ==current.name
-        ]
+        __previous__ = previous_by_key.get((get(current, 'benchmark_id'), get(current, 'name')), [])
         if len(__previous__) == 1:
             previous = __previous__[0]
-            change = (current.measurement / previous.measurement * 100) - 100
+            change = (get(current, 'measurement') / get(previous, 'measurement') * 100) - 100
             result.append({
                 "current": current,
                 "previous": previous,
@@ -0,0 +1,90 @@
+"""
+Helpers for the LRU file caches kept on local disk (COMPARISON_CACHE_DIR and
+BUNDLE_CACHE_DIR), trimmed periodically by prune_disk_caches.
+"""
+
+import errno
+import logging
+import os
+import tempfile
+
+
+logger = logging.getLogger("tasks")
+
+TMP_PREFIX = '.tmp-'
+
+
+def read(path):
+    """
+    Returns the content of the entry at `path`, marking it as used, or None
+    if there is no such entry.
+    """
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+        os.utime(path, None)
+    except (IOError, OSError):
+        # not there, or evicted concurrently
+        return None
+    return content
+
+
+def write(path, content):
+    """
+    Stores `content` at `path` through a temporary file that is renamed into
+    place, so that readers never see a partial entry.
+    """
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    fd, tmp = tempfile.mkstemp(prefix=TMP_PREFIX, dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.rename(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def evict(directory, max_size):
+    """
+    Removes the least recently used entries of the cache in `directory`
+    until it takes at most `max_size` bytes. Returns the number of entries
+    removed.
+    """
+    entries = []
+    total = 0
+    for parent, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if filename.startswith(TMP_PREFIX):
+                # still being written
+                continue
+            path = os.path.join(parent, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    if total <= max_size:
+        return 0
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass  # evicted concurrently
+        total -= size
+
+    logger.info("Evicted %d entries from %s" % (removed, directory))
+    return removed
@@ -0,0 +1,257 @@
+"""
+Per-process name -> id caches for Benchmark, BenchmarkGroup and Environment,
+dropped whenever any process renames or deletes a row (see current_generation).
+"""
+
+import threading
+import time
+
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models.signals import post_save, post_delete
+
+from benchmarks.models import Benchmark, BenchmarkGroup, Environment
+
+
+def current_generation():
+    # changed by database triggers whenever a row of the cached tables is
+    # renamed or deleted (see migration 0063)
+    with transaction.get_connection().cursor() as cursor:
+        cursor.execute("SELECT generation FROM benchmarks_identity_generation")
+        return cursor.fetchone()[0]
+
+
+def unique(items):
+    # like set(), but keeps the original order so that ids are assigned in
+    # the same order as the items are given
+    seen = set()
+    return [i for i in items if not (i in seen or seen.add(i))]
+
+
+class IdentityCache(object):
+
+    def __init__(self, model, fields, defaults=None):
+        self.model = model
+        self.fields = fields
+        self.defaults = defaults
+        self.hits = 0
+        self.misses = 0
+        self.__entries__ = OrderedDict()  # key -> (id, expiration)
+        self.__keys__ = {}  # id -> key
+        self.__generation__ = None
+        self.__lock__ = threading.Lock()
+        self.__local__ = threading.local()
+
+    def __key__(self, instance):
+        key = tuple(getattr(instance, f) for f in self.fields)
+        return key[0] if len(self.fields) == 1 else key
+
+    def __uncommitted__(self, txid):
+        # keys of the rows created or renamed by the current transaction of
+        # this thread
+        local = self.__local__
+        if getattr(local, 'txid', None) != txid:
+            local.txid = txid
+            local.keys = set()
+        return local.keys
+
+    def __lookup__(self, keys):
+        # one query for all keys; composite keys are filtered on their first
+        # field and matched in Python. Inside a transaction, the same query
+        # also returns its id (or None if there are no rows).
+        first = self.fields[0]
+        if len(self.fields) == 1:
+            values = keys
+        else:
+            values = set(k[0] for k in keys)
+        wanted = set(keys)
+
+        columns = self.fields + ('id',)
+        existing = (self.model.objects
+                    .filter(**{first + '__in': values})
+                    .order_by('id'))
+        atomic = transaction.get_connection().in_atomic_block
+        if atomic:
+            existing = existing.extra(select={'txid': 'txid_current()'})
+            columns += ('txid',)
+
+        found = {}
+        txid = None
+        for row in existing.values_list(*columns):
+            if atomic:
+                txid = row[-1]
+                row = row[:-1]
+            key = row[0] if len(self.fields) == 1 else tuple(row[:-1])
+            if key in wanted:
+                found.setdefault(key, row[-1])
+        return found, txid
+
+    def __create__(self, keys):
+        # bulk_create() bypasses save(), so anything it fills in by default
+        # has to come from `defaults`
+        def build(key):
+            if len(self.fields) == 1:
+                key = (key,)
+            attrs = dict(zip(self.fields, key))
+            if self.defaults:
+                attrs.update(self.defaults(attrs))
+            return self.model(**attrs)
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create([build(k) for k in keys])
+        except IntegrityError:
+            # a concurrent process created (some of) them first
+            pass
+
+    def __fetch_entry__(self, key):
+        entry = self.__entries__.pop(key, None)
+        if entry is None:
+            return None
+        pk, expiration = entry
+        if expiration < time.time():
+            self.__keys__.pop(pk, None)
+            return None
+        self.__entries__[key] = entry  # most recently used
+        return pk
+
+    def __store_entry__(self, key, pk):
+        old_key = self.__keys__.get(pk)
+        if old_key is not None:
+            # renamed since it was cached
+            self.__entries__.pop(old_key, None)
+        self.__entries__.pop(key, None)
+        self.__entries__[key] = (pk, time.time() + settings.IDENTITY_CACHE_TIMEOUT)
+        self.__keys__[pk] = key
+        while len(self.__entries__) > settings.IDENTITY_CACHE_SIZE:
+            _, (old_pk, _) = self.__entries__.popitem(last=False)
+            self.__keys__.pop(old_pk, None)
+
+    def resolve(self, keys, create=True):
+        """
+        Returns a dictionary mapping the given keys to ids. Keys not in the
+        cache (which is first checked against current_generation) are looked
+        up with a single query, and the ones that don't exist
+        in the database are created with a single INSERT (unless `create` is
+        False).
+        """
+        keys = unique(keys)
+        result = {}
+        missing = []
+
+        generation = current_generation()
+        with self.__lock__:
+            if generation != self.__generation__:
+                # renamed or deleted by some process since
+                self.__entries__.clear()
+                self.__keys__.clear()
+                self.__generation__ = generation
+            for key in keys:
+                pk = self.__fetch_entry__(key)
+                if pk is None:
+                    missing.append(key)
+                else:
+                    result[key] = pk
+            self.hits += len(result)
+            self.misses += len(missing)
+
+        if not missing:
+            return result
+
+        found, txid = self.__lookup__(missing)
+        created = {}
+        if create:
+            new = [k for k in missing if k not in found]
+            if new:
+                self.__create__(new)
+                created, created_txid = self.__lookup__(new)
+                txid = txid or created_txid
+                found.update(created)
+
+        cacheable = found
+        if transaction.get_connection().in_atomic_block and found:
+            # rows created by this transaction are gone if it is rolled
+            # back, so only cache the ones that were there before it
+            uncommitted = self.__uncommitted__(txid)
+            uncommitted.update(created)
+            cacheable = {k: pk for k, pk in found.items() if k not in uncommitted}
+
+        with self.__lock__:
+            for key, pk in cacheable.items():
+                self.__store_entry__(key, pk)
+
+        result.update(found)
+        return result
+
+    def get_id(self, key, create=True):
+        return self.resolve([key], create=create).get(key)
+
+    def invalidate(self, pk):
+        with self.__lock__:
+            key = self.__keys__.pop(pk, None)
+            if key is not None:
+                self.__entries__.pop(key, None)
+
+    def saved(self, instance):
+        """
+        Called when `instance` is saved: inside a transaction, its key must
+        not be cached until the transaction is over.
+        """
+        self.invalidate(instance.pk)
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT txid_current()")
+            txid = cursor.fetchone()[0]
+        self.__uncommitted__(txid).add(self.__key__(instance))
+
+    def clear(self):
+        with self.__lock__:
+            self.__entries__.clear()
+            self.__keys__.clear()
+
+    def stats(self):
+        return {
+            'size': len(self.__entries__),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+benchmarks = IdentityCache(Benchmark, ('name', 'group_id'))
+groups = IdentityCache(BenchmarkGroup, ('name',))
+environments = IdentityCache(
+    Environment,
+    ('identifier',),
+    defaults=lambda attrs: {'name': attrs['identifier']},
+)
+
+caches = {
+    Benchmark: benchmarks,
+    BenchmarkGroup: groups,
+    Environment: environments,
+}
+
+
+def clear():
+    for cache in caches.values():
+        cache.clear()
+
+
+def stats():
+    return {model.__name__: cache.stats() for model, cache in caches.items()}
+
+
+def saved(sender, instance, **kwargs):
+    caches[sender].saved(instance)
+
+
+def invalidate(sender, instance, **kwargs):
+    caches[sender].invalidate(instance.pk)
+
+
+for model in caches:
+    post_save.connect(saved, sender=model, dispatch_uid='identity-save-%s' % model.__name__)
+    post_delete.connect(invalidate, sender=model, dispatch_uid='identity-delete-%s' % model.__name__)
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from collections import defaultdict
+
+from django.db import transaction
+
+from benchmarks import identity, rollups
+from benchmarks.models import BenchmarkGroupSummary, ResultData
+
+
+logger = logging.getLogger("tasks")
+
+ROOT_GROUP = '/'
+
+
+def fingerprint(test_results):
+    """
+    SHA-256 of parsed test results, regardless of the order of their keys.
+    """
+    return hashlib.sha256(json.dumps(test_results, sort_keys=True)).hexdigest()
+
+
+class DuplicateCounter(object):
+    """
+    Counts, per process, the artifacts that were not ingested again because
+    their test job already had results from identical content, and the
+    ResultData rows that were therefore not written again.
+    """
+
+    def __init__(self):
+        self.artifacts = 0
+        self.rows = 0
+        self.__lock__ = threading.Lock()
+
+    def add(self, testjob):
+        rows = ResultData.objects.filter(test_job_id=testjob.id).count()
+        with self.__lock__:
+            self.artifacts += 1
+            self.rows += rows
+        logger.info("Skipped duplicate results for %s (%d rows); %s" % (testjob.id, rows, self.stats()))
+
+    def stats(self):
+        return {
+            'artifacts': self.artifacts,
+            'rows': self.rows,
+        }
+
+
+duplicates = DuplicateCounter()
+
+
+def store_test_results(testjob, test_results):
+    """
+    Stores the parsed results of a test job as ResultData, plus one
+    BenchmarkGroupSummary per benchmark group (and the root group), using a
+    constant number of queries regardless of the number of subscores. The
+    rows are written in a single transaction, together with the daily and
+    weekly rollups and the test job being marked as having its results
+    loaded.
+
+    Returns the number of ResultData rows inserted.
+    """
+    start = time.time()
+
+    # resolved before the transaction so that the ids can be cached
+    group_names = [ROOT_GROUP] + [r['benchmark_group'] for r in test_results if 'benchmark_group' in r]
+    groups = identity.groups.resolve(group_names)
+    root_group_id = groups[ROOT_GROUP]
+
+    def group_id(result):
+        if 'benchmark_group' in result:
+            return groups[result['benchmark_group']]
+        return None
+
+    benchmarks = identity.benchmarks.resolve(
+        (r['benchmark_name'], group_id(r)) for r in test_results
+    )
+
+    result_data = []
+    summary_by_group = {}
+
+    def summary(gid):
+        if gid not in summary_by_group:
+            summary_by_group[gid] = BenchmarkGroupSummary(
+                group_id=gid,
+                environment_id=testjob.environment_id,
+                created_at=testjob.created_at,
+                result_id=testjob.result_id,
+                test_job_id=testjob.id,
+            )
+        return summary_by_group[gid]
+
+    for result in test_results:
+        benchmark_group_id = group_id(result)
+        benchmark_id = benchmarks[(result['benchmark_name'], benchmark_group_id)]
+
+        subscore_results = defaultdict(list)
+        for item in result['subscore']:
+            subscore_results[item['name']].append(item['measurement'])
+
+        for name, values in subscore_results.items():
+            data = ResultData(
+                name=name,
+                created_at=testjob.created_at,
+                values=values,
+                result_id=testjob.result_id,
+                test_job_id=testjob.id,
+                benchmark_id=benchmark_id,
+            )
+            data.calculate_statistics()
+            result_data.append(data)
+
+            if benchmark_group_id:
+                summary(benchmark_group_id).add_values(values)
+                summary(root_group_id).add_values(values)
+
+    summaries = summary_by_group.values()
+
+    with transaction.atomic():
+        ResultData.objects.bulk_create(result_data)
+        BenchmarkGroupSummary.objects.bulk_create(summaries)
+        testjob.result.update_data_count(len(result_data))
+        rollups.update(testjob, result_data, summaries)
+        testjob.results_loaded = True
+        testjob.results_fingerprint = fingerprint(test_results)
+        testjob.save(update_fields=['results_loaded', 'results_fingerprint', 'updated_at'])
+
+    elapsed = time.time() - start
+    rows = len(result_data) + len(summaries)
+    logger.info(
+        "Stored %d result data and %d summaries for %s in %.3fs (%.0f rows/s)" % (
+            len(result_data),
+            len(summaries),
+            testjob.id,
+            elapsed,
+            rows / elapsed if elapsed > 0 else rows,
+        )
+    )
+    logger.debug("Identity caches: %s" % identity.stats())
+
+    return len(result_data)
@@ -0,0 +1,69 @@
+"""
+Per test job PostgreSQL advisory locks, so that at most one
+set_testjob_results fetches the results of a test job at a time.
+"""
+
+import logging
+import threading
+import zlib
+
+from contextlib import contextmanager
+
+from django.db import connection, DatabaseError
+
+
+logger = logging.getLogger("tasks")
+
+# first half of the key of test job locks, to tell them apart from any other
+# advisory lock taken in the same database
+TESTJOB_LOCK_CLASS = 0x746a
+
+
+def lock_key(testjob_id):
+    # the second half is a (signed) 32-bit integer; test jobs whose ids
+    # collide just can't be fetched at the same time
+    key = zlib.crc32((u'%s' % testjob_id).encode('utf-8')) & 0xffffffff
+    return key - (1 << 32) if key >= (1 << 31) else key
+
+
+@contextmanager
+def testjob_lock(testjob_id):
+    """
+    Tries to lock the test job for the duration of the block, without
+    waiting, and yields whether it did: False means another process holds
+    the lock. The lock belongs to the database session, so it is released
+    if the worker dies.
+    """
+    key = lock_key(testjob_id)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s, %s)", [TESTJOB_LOCK_CLASS, key])
+        acquired = cursor.fetchone()[0]
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s, %s)", [TESTJOB_LOCK_CLASS, key])
+            except DatabaseError:
+                # the session, and the lock with it, is gone already
+                logger.info("Could not unlock test job %s" % testjob_id)
+
+
+class SkippedCounter(object):
+    """
+    Counts, per process, the fetches that were skipped because the results
+    of the same test job were already being fetched.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.__lock__ = threading.Lock()
+
+    def add(self, testjob_id):
+        with self.__lock__:
+            self.count += 1
+        logger.info("Skipped fetching %s, already in progress; %d skipped" % (testjob_id, self.count))
+
+
+skipped = SkippedCounter()
@@ -6,11 +6,13 @@ from django.core.mail import send_mail, EmailMessage
 from django.template.loader import render_to_string
 
 from benchmarks import progress
-from benchmarks.comparison import render_comparison
+from benchmarks.comparison import render_comparisons
 
 
 def render_results(results):
-    comparisons = {p: render_comparison(p.before, p.after) for p in results}
+    results = list(results)
+    outputs = render_comparisons((p.before, p.after) for p in results)
+    comparisons = dict(zip(results, outputs))
     key = lambda t: t[0].environment.identifier
     return OrderedDict(sorted(comparisons.items(), key=key))
 
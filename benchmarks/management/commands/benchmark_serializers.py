@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import time
+
+from django.core.management.base import BaseCommand
+
+
+from api import serializers
+from benchmarks.models import BenchmarkGroupSummary, ResultData, TestJob
+
+
+CASES = (
+    (
+        'ResultData',
+        ResultData.objects.select_related('benchmark', 'result'),
+        serializers.ResultDataSerializer,
+        serializers.ResultDataValuesSerializer,
+    ),
+    (
+        'TestJob',
+        TestJob.objects.all(),
+        serializers.TestJobSerializer,
+        serializers.TestJobValuesSerializer,
+    ),
+    (
+        'BenchmarkGroupSummary',
+        BenchmarkGroupSummary.objects.select_related('result'),
+        serializers.BenchmarkGroupSummarySerializer,
+        serializers.BenchmarkGroupSummaryValuesSerializer,
+    ),
+)
+
+
+class Command(BaseCommand):
+
+    help = 'Measures rows per second of the model serializers against the values() serializers, on existing data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=5000,
+            help='Number of rows to serialize per run (default: 5000)'
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=3,
+            help='Number of runs; the fastest one is reported (default: 3)'
+        )
+
+    def handle(self, *args, **options):
+        for name, queryset, model_serializer, values_serializer in CASES:
+            queryset = queryset.order_by('-created_at')[:options['rows']]
+
+            # both timings include the query, since skipping model instances
+            # is part of what the values() serializers save
+            model = self.measure(lambda: model_serializer(list(queryset), many=True).data, options['runs'])
+            values = self.measure(lambda: values_serializer(list(values_serializer.values(queryset)), many=True).data, options['runs'])
+
+            if not model[0]:
+                self.stdout.write('%s: no rows' % name)
+                continue
+            model_rate = model[0] / model[1]
+            values_rate = values[0] / values[1]
+            self.stdout.write('%s: %d rows, model %.0f rows/s, values %.0f rows/s (%.1fx)' % (
+                name, model[0], model_rate, values_rate, values_rate / model_rate,
+            ))
+
+    def measure(self, serialize, runs):
+        best = None
+        for _ in range(runs):
+            start = time.time()
+            rows = len(serialize())
+            elapsed = max(time.time() - start, 1e-6)
+            if best is None or elapsed < best:
+                best = elapsed
+        return rows, best
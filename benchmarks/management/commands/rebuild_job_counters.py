@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.db.models import Count, Sum, Case, When
+
+
+from benchmarks.models import Result, ResultData, TestJob
+
+
+class Command(BaseCommand):
+
+    help = 'Recalculates Result.total_jobs, Result.completed_jobs and Result.data_count from the test jobs and result data'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        counts = TestJob.objects.values('result_id').annotate(
+            total=Count('id'),
+            completed=Sum(Case(When(completed=True, then=1), default=0, output_field=models.IntegerField())),
+        )
+
+        Result.objects.update(total_jobs=0, completed_jobs=0)
+        for item in counts:
+            Result.objects.filter(pk=item['result_id']).update(
+                total_jobs=item['total'],
+                completed_jobs=item['completed'],
+            )
+
+        data_counts = ResultData.objects.values('result_id').annotate(count=Count('id'))
+
+        Result.objects.update(data_count=0)
+        for item in data_counts:
+            Result.objects.filter(pk=item['result_id']).update(data_count=item['count'])
+
+        self.stdout.write('Job counters rebuilt for %d builds' % len(counts))
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+from benchmarks import rollups
+from benchmarks.models import ResultDataRollup, BenchmarkGroupSummaryRollup
+
+
+class Command(BaseCommand):
+
+    help = 'Recreates the daily and weekly rollups from ResultData and BenchmarkGroupSummary'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        rollups.rebuild()
+        self.stdout.write('%d result data and %d summary rollups rebuilt' % (
+            ResultDataRollup.objects.count(),
+            BenchmarkGroupSummaryRollup.objects.count(),
+        ))
@@ -6,7 +6,8 @@ from django.core.management.base import BaseCommand
 
 
 from benchmarks.tasks import store_testjob_data
-from benchmarks.models import ResultData, Benchmark, BenchmarkGroupSummary, TestJob
+from benchmarks.models import Result, ResultData, Benchmark, BenchmarkGroupSummary, TestJob
+from benchmarks.models import ResultDataRollup, BenchmarkGroupSummaryRollup
 
 
 def step(s):
@@ -23,6 +24,9 @@ class Command(BaseCommand):
         ResultData.objects.all().delete()
         Benchmark.objects.all().delete()
         BenchmarkGroupSummary.objects.all().delete()
+        ResultDataRollup.objects.all().delete()
+        BenchmarkGroupSummaryRollup.objects.all().delete()
+        Result.objects.update(data_count=0)
 
         errors = []
 
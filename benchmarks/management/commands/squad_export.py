@@ -8,6 +8,7 @@ from django.core.management.base import BaseCommand
 
 
 from benchmarks.models import Result
+from benchmarks.storage import local_copy
 
 # mapping ART-reports → squad:
 # Result → Build
@@ -79,5 +80,5 @@ class Command(BaseCommand):
             with open(os.path.join(jobdir, 'metadata.json'), 'w') as f:
                 f.write(json.dumps(metadata, indent=4))
         if testjob.data:
-            filename = testjob.data.file.name
-            shutil.copy2(filename, os.path.join(jobdir, os.path.basename(filename)))
+            with local_copy(testjob.data) as filename:
+                shutil.copy2(filename, os.path.join(jobdir, os.path.basename(testjob.data.name)))
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+from django.core.management.base import BaseCommand
+
+
+from benchmarks.models import TestJob
+
+
+def human(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(size) < 1024:
+            return '%.1f %s' % (size, unit)
+        size /= 1024.0
+    return '%.1f TiB' % size
+
+
+class Command(BaseCommand):
+
+    help = 'Reports the space saved by deduplicating and compressing TestJob.data files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            dest='convert',
+            help='Move files stored before content addressing into it first'
+        )
+
+    def handle(self, *args, **options):
+        testjobs = TestJob.objects.exclude(data=None).exclude(data='')
+        storage = TestJob._meta.get_field('data').storage
+
+        if options['convert'] and hasattr(storage, 'content_hash'):
+            converted = 0
+            for testjob in testjobs.only('id', 'data').iterator():
+                old = testjob.data.name
+                if storage.content_hash(old) or not storage.exists(old):
+                    continue
+                new = storage.save(old, testjob.data.file)
+                testjob.data.close()
+                TestJob.objects.filter(pk=testjob.pk).update(data=new)
+                storage.delete(old)
+                converted += 1
+            self.stdout.write('%d files converted' % converted)
+
+        names = [n for n in testjobs.values_list('data', flat=True).iterator() if storage.exists(n)]
+        if hasattr(storage, 'usage'):
+            logical, physical = storage.usage(names)
+        else:
+            logical = physical = sum(storage.size(n) for n in names)
+
+        self.stdout.write('%d files, %s of data stored in %s (%s saved)' % (
+            len(names), human(logical), human(physical), human(logical - physical),
+        ))
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, Case, When, F
+
+
+def count_jobs(apps, schema_editor):
+    Result = apps.get_model('benchmarks', 'Result')
+    TestJob = apps.get_model('benchmarks', 'TestJob')
+
+    counts = TestJob.objects.values('result_id').annotate(
+        total=Count('id'),
+        completed=Sum(Case(When(completed=True, then=1), default=0, output_field=models.IntegerField())),
+    )
+    for item in counts:
+        Result.objects.filter(pk=item['result_id']).update(
+            total_jobs=item['total'],
+            completed_jobs=item['completed'],
+        )
+
+
+def set_completed(apps, schema_editor):
+    Result = apps.get_model('benchmarks', 'Result')
+    Result.objects.filter(total_jobs__gt=0, completed_jobs=F('total_jobs')).update(completed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('benchmarks', '0054_result_annotation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='result',
+            name='total_jobs',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='result',
+            name='completed_jobs',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(
+            count_jobs,
+            reverse_code=set_completed,
+        ),
+        migrations.RemoveField(
+            model_name='result',
+            name='completed',
+        ),
+    ]
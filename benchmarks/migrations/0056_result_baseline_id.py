@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def resolve_baselines(apps, schema_editor):
+    Result = apps.get_model('benchmarks', 'Result')
+    Manifest = apps.get_model('benchmarks', 'Manifest')
+    TestJob = apps.get_model('benchmarks', 'TestJob')
+
+    # same query as Result.resolve_baseline
+    for result in Result.objects.filter(test_jobs__environment__isnull=False).distinct():
+        baseline_id = Result.objects.exclude(id=result.id).filter(
+            branch_name=result.branch_name,
+            gerrit_change_number=None,
+            manifest__reduced_id__in=Manifest.objects.filter(id=result.manifest_id).values('reduced_id'),
+            test_jobs__environment_id__in=TestJob.objects.filter(result_id=result.id).values('environment_id'),
+        ).order_by('-created_at').values_list('id', flat=True).first()
+        if baseline_id:
+            Result.objects.filter(pk=result.pk).update(baseline_id=baseline_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('benchmarks', '0055_result_job_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='result',
+            name='baseline_id',
+            field=models.IntegerField(db_index=True, null=True, blank=True),
+        ),
+        migrations.RunPython(
+            resolve_baselines,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_data(apps, schema_editor):
+    Result = apps.get_model('benchmarks', 'Result')
+    ResultData = apps.get_model('benchmarks', 'ResultData')
+
+    for item in ResultData.objects.values('result_id').annotate(count=Count('id')):
+        Result.objects.filter(pk=item['result_id']).update(data_count=item['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('benchmarks', '0056_result_baseline_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='result',
+            name='data_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(
+            count_data,
+            reverse_code=migrations.RunPython.noop,
+        ),
+        migrations.AlterIndexTogether(
+            name='result',
+            index_together=set([('build_id', 'name'), ('branch_name', 'created_at')]),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('benchmarks', '0057_result_data_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='benchmarkgroupsummary',
+            name='log_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='benchmarkgroupsummary',
+            name='count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE benchmarks_benchmarkgroupsummary s
+            SET log_sum = agg.log_sum, count = agg.count
+            FROM (
+                SELECT id,
+                       COALESCE(SUM(CASE WHEN v > 0 THEN LN(v) END), 0) AS log_sum,
+                       COUNT(CASE WHEN v > 0 THEN 1 END) AS count
+                FROM benchmarks_benchmarkgroupsummary, unnest("values") AS v
+                GROUP BY id
+            ) agg
+            WHERE agg.id = s.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        # the values column is kept, with existing data, for one release, so
+        # that this migration can be reversed; new rows get an empty array
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    """ALTER TABLE benchmarks_benchmarkgroupsummary ALTER COLUMN "values" SET DEFAULT '{}'""",
+                    reverse_sql="""ALTER TABLE benchmarks_benchmarkgroupsummary ALTER COLUMN "values" DROP DEFAULT""",
+                ),
+            ],
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='benchmarkgroupsummary',
+                    name='values',
+                ),
+            ],
+        ),
+    ]
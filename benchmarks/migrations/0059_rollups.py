@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('benchmarks', '0058_benchmarkgroupsummary_log_sum'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BenchmarkGroupSummaryRollup',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('period', models.CharField(max_length=4, choices=[(b'day', b'Daily'), (b'week', b'Weekly')])),
+                ('start', models.DateTimeField()),
+                ('branch_name', models.CharField(max_length=128)),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('total_squares', models.FloatField(default=0)),
+                ('minimum', models.FloatField(null=True)),
+                ('maximum', models.FloatField(null=True)),
+                ('log_sum', models.FloatField(default=0)),
+                ('log_count', models.IntegerField(default=0)),
+                ('environment', models.ForeignKey(related_name='+', to='benchmarks.Environment')),
+                ('group', models.ForeignKey(related_name='+', to='benchmarks.BenchmarkGroup')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResultDataRollup',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('period', models.CharField(max_length=4, choices=[(b'day', b'Daily'), (b'week', b'Weekly')])),
+                ('start', models.DateTimeField()),
+                ('branch_name', models.CharField(max_length=128)),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('total_squares', models.FloatField(default=0)),
+                ('minimum', models.FloatField(null=True)),
+                ('maximum', models.FloatField(null=True)),
+                ('log_sum', models.FloatField(default=0)),
+                ('log_count', models.IntegerField(default=0)),
+                ('name', models.CharField(max_length=256)),
+                ('benchmark', models.ForeignKey(related_name='+', to='benchmarks.Benchmark')),
+                ('environment', models.ForeignKey(related_name='+', to='benchmarks.Environment')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='resultdatarollup',
+            unique_together=set([('period', 'branch_name', 'environment', 'benchmark', 'name', 'start')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='benchmarkgroupsummaryrollup',
+            unique_together=set([('period', 'branch_name', 'environment', 'group', 'start')]),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('benchmarks', '0059_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='result',
+            index_together=set([('branch_name', 'created_at'), ('created_at', 'id'), ('build_id', 'name')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='testjob',
+            index_together=set([('created_at', 'id')]),
+        ),
+    ]
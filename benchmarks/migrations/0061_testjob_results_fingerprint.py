@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('benchmarks', '0060_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testjob',
+            name='results_fingerprint',
+            field=models.CharField(default=b'', max_length=64, blank=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('benchmarks', '0061_testjob_results_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testjob',
+            name='next_poll_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='testjob',
+            name='poll_attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterIndexTogether(
+            name='testjob',
+            index_together=set([('completed', 'next_poll_at'), ('created_at', 'id')]),
+        ),
+    ]
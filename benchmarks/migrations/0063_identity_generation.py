@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# benchmarks.identity caches are cleared when the generation changes. It is
+# set to the id of the transaction that renamed or deleted a row, so that it
+# never goes back to a value already seen, even if that transaction is rolled
+# back.
+CREATE_IDENTITY_GENERATION = """
+CREATE TABLE benchmarks_identity_generation (generation bigint NOT NULL);
+INSERT INTO benchmarks_identity_generation VALUES (txid_current());
+
+CREATE FUNCTION benchmarks_identity_changed() RETURNS trigger AS $$
+BEGIN
+    UPDATE benchmarks_identity_generation SET generation = txid_current();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER benchmarks_benchmark_identity_update
+    AFTER UPDATE ON benchmarks_benchmark FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name OR OLD.group_id IS DISTINCT FROM NEW.group_id)
+    EXECUTE PROCEDURE benchmarks_identity_changed();
+CREATE TRIGGER benchmarks_benchmark_identity_delete
+    AFTER DELETE ON benchmarks_benchmark FOR EACH STATEMENT
+    EXECUTE PROCEDURE benchmarks_identity_changed();
+
+CREATE TRIGGER benchmarks_benchmarkgroup_identity_update
+    AFTER UPDATE ON benchmarks_benchmarkgroup FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE PROCEDURE benchmarks_identity_changed();
+CREATE TRIGGER benchmarks_benchmarkgroup_identity_delete
+    AFTER DELETE ON benchmarks_benchmarkgroup FOR EACH STATEMENT
+    EXECUTE PROCEDURE benchmarks_identity_changed();
+
+CREATE TRIGGER benchmarks_environment_identity_update
+    AFTER UPDATE ON benchmarks_environment FOR EACH ROW
+    WHEN (OLD.identifier IS DISTINCT FROM NEW.identifier)
+    EXECUTE PROCEDURE benchmarks_identity_changed();
+CREATE TRIGGER benchmarks_environment_identity_delete
+    AFTER DELETE ON benchmarks_environment FOR EACH STATEMENT
+    EXECUTE PROCEDURE benchmarks_identity_changed();
+"""
+
+DROP_IDENTITY_GENERATION = """
+DROP TRIGGER benchmarks_benchmark_identity_update ON benchmarks_benchmark;
+DROP TRIGGER benchmarks_benchmark_identity_delete ON benchmarks_benchmark;
+DROP TRIGGER benchmarks_benchmarkgroup_identity_update ON benchmarks_benchmarkgroup;
+DROP TRIGGER benchmarks_benchmarkgroup_identity_delete ON benchmarks_benchmarkgroup;
+DROP TRIGGER benchmarks_environment_identity_update ON benchmarks_environment;
+DROP TRIGGER benchmarks_environment_identity_delete ON benchmarks_environment;
+DROP FUNCTION benchmarks_identity_changed();
+DROP TABLE benchmarks_identity_generation;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('benchmarks', '0062_testjob_poll_schedule'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=CREATE_IDENTITY_GENERATION,
+            reverse_sql=DROP_IDENTITY_GENERATION,
+        ),
+    ]
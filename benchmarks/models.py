@@ -8,7 +8,9 @@ from math  import log, exp
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Count
+from django.db.models import F
+from django.db.models.signals import class_prepared, pre_delete
+from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.fields import HStoreField
@@ -94,13 +96,28 @@ class Result(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True, null=True)
 
-    completed = models.BooleanField(default=False)
+    # maintained by TestJob with atomic UPDATEs; see TestJob.save
+    total_jobs = models.IntegerField(default=0)
+    completed_jobs = models.IntegerField(default=0)
+
+    # number of ResultData rows, maintained on insert; see update_data_count
+    data_count = models.IntegerField(default=0)
+
+    # resolved by update_baseline() as test jobs get environments; can't be a
+    # proper ForeignKey because it breaks django_dynamic_fixtures (it would
+    # create a new Result for every Result)
+    baseline_id = models.IntegerField(blank=True, null=True, db_index=True)
+
     reported = models.BooleanField(default=False)
 
     annotation = models.CharField(max_length=1024, blank=True, null=True)
 
     class Meta:
-        index_together = ["build_id", "name"]
+        index_together = [
+            ["build_id", "name"],
+            ["branch_name", "created_at"],
+            ["created_at", "id"],
+        ]
         unique_together = ["build_id", "name"]
         ordering = ['-created_at']
 
@@ -108,48 +125,98 @@ class Result(models.Model):
     def permalink(self):
         return "%s/#/build/%s" % (settings.URL, self.id)
 
+    @property
+    def completed(self):
+        return self.total_jobs > 0 and self.completed_jobs == self.total_jobs
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            # no test jobs yet, so nothing to compare against
+            self.baseline_id = None
+        elif kwargs.get('update_fields') is None:
+            # never write back job counters or baseline that may be stale by now
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in ('total_jobs', 'completed_jobs', 'data_count', 'baseline_id')
+            ]
+        return super(Result, self).save(*args, **kwargs)
+
+    def update_job_counters(self, total, completed):
+        self._default_manager.filter(pk=self.pk).update(
+            total_jobs=F('total_jobs') + total,
+            completed_jobs=F('completed_jobs') + completed,
+            updated_at=timezone.now(),
+        )
+        self.total_jobs += total
+        self.completed_jobs += completed
+
+    def update_data_count(self, count):
+        self._default_manager.filter(pk=self.pk).update(
+            data_count=F('data_count') + count,
+        )
+        self.data_count += count
+
     __baseline__ = False
     __to_compare__ = False
 
     @property
     def baseline(self):
         # basic per-instance caching
-        if self.__baseline__ != False:
-            return self.__baseline__
+        if self.__baseline__ == False or getattr(self.__baseline__, 'id', None) != self.baseline_id:
+            self.__baseline__ = self._default_manager.filter(id=self.baseline_id).first() if self.baseline_id else None
+        return self.__baseline__
 
-        possible_baselines = self._default_manager.exclude(id=self.id).filter(
+    def resolve_baseline(self):
+        """
+        Returns the id of the most recent baseline build (i.e. not a gerrit
+        change) for the same branch and reduced manifest that has test jobs
+        in at least one of the environments of this result, with a single
+        query.
+        """
+        return self._default_manager.exclude(id=self.id).filter(
             branch_name=self.branch_name,
             gerrit_change_number=None,
-            manifest__reduced__hash=self.manifest.reduced.hash
-        ).order_by('-created_at')
-
-        # baseline must have environments in common
-        environments = [e['environment_id'] for e in self.test_jobs.all().values('environment_id').distinct()]
-        self.__baseline__ = None
-
-        for baseline in possible_baselines:
-            if baseline.test_jobs.filter(environment_id__in=environments).exists():
-                self.__baseline__ = baseline
-                break
-
-        return self.__baseline__
+            manifest__reduced_id__in=Manifest.objects.filter(id=self.manifest_id).values('reduced_id'),
+            test_jobs__environment_id__in=TestJob.objects.filter(result_id=self.id).values('environment_id'),
+        ).order_by('-created_at').values_list('id', flat=True).first()
+
+    def update_baseline(self):
+        self.baseline_id = self.resolve_baseline()
+        self._default_manager.filter(pk=self.pk).update(baseline_id=self.baseline_id)
+
+    def offer_as_baseline(self, environment_id):
+        """
+        Called when this result gets a test job in `environment_id`. If this
+        is a baseline build, it becomes the baseline of the builds for the
+        same branch and reduced manifest that have that environment too and
+        whose current baseline (if any) is older than it.
+        """
+        if self.gerrit_change_number is not None or environment_id is None:
+            return 0
+        newer = models.Q(baseline_id=None) | models.Q(
+            baseline_id__in=self._default_manager.filter(created_at__lt=self.created_at).values('id')
+        )
+        return self._default_manager.exclude(id=self.id).filter(
+            newer,
+            branch_name=self.branch_name,
+            manifest__reduced_id__in=Manifest.objects.filter(id=self.manifest_id).values('reduced_id'),
+            test_jobs__environment_id=environment_id,
+        ).update(baseline_id=self.id)
 
     def to_compare(self, results=True):
         # basic per-instance caching
         if self.__to_compare__ != False:
-            return self.__to_compare___
+            return self.__to_compare__
 
-        if self.data.count() == 0:
+        if self.data_count == 0:
             self.__to_compare__ = None
             return self.__to_compare__
 
-        __to_compare__ = self._default_manager.annotate(
-            data_count=Count('data')
-        ).filter(
+        __to_compare__ = self._default_manager.filter(
             data_count__gt=0,
             branch_name=self.branch_name,
             gerrit_change_number=None,
-            manifest__reduced__hash=self.manifest.reduced.hash
+            manifest__reduced_id__in=Manifest.objects.filter(id=self.manifest_id).values('reduced_id'),
         ).order_by('-created_at')
 
         if self.gerrit_change_number is None:  # baseline build
@@ -160,7 +227,6 @@ class Result(models.Model):
         self.__to_compare__ = __to_compare__.first()
         return self.__to_compare__
 
-
     @property
     def testjobs_updated(self):
         if not self.updated_at:
@@ -190,42 +256,99 @@ class TestJob(models.Model):
     testrunnerurl = models.CharField(blank=True, default="https://validation.linaro.org/", max_length=256)
 
     results_loaded = models.BooleanField(default=False)
+    # SHA-256 of the parsed results that were loaded (see ingestion.fingerprint)
+    results_fingerprint = models.CharField(blank=True, default="", max_length=64)
+
+    # when check_testjob_completeness will poll this job next, and how many
+    # times it was polled since its status last changed
+    next_poll_at = models.DateTimeField(default=timezone.now)
+    poll_attempts = models.IntegerField(default=0)
 
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True, null=True)
 
     metadata = HStoreField(default=dict, blank=True)
 
+    # values of `completed` and `environment` as last read from/written to
+    # the database; not known if either was deferred (.only()/.defer())
+    __saved_completed__ = False
+    __saved_environment_id__ = None
+    __saved_known__ = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(TestJob, cls).from_db(db, field_names, values)
+        if 'completed' in instance.__dict__ and 'environment_id' in instance.__dict__:
+            instance.__saved_completed__ = instance.__dict__['completed']
+            instance.__saved_environment_id__ = instance.__dict__['environment_id']
+        else:
+            instance.__saved_known__ = False
+        return instance
+
+    def __load_saved__(self):
+        if not self.__saved_known__:
+            self.__saved_completed__, self.__saved_environment_id__ = (
+                TestJob.objects.filter(pk=self.pk).values_list('completed', 'environment_id').get())
+            self.__saved_known__ = True
+
     def save(self, *args, **kwargs):
         jenkins_id_re = re.compile(r"J\d+_[\w\d\_\.]+")
         if jenkins_id_re.match(self.id):
             self.testrunnerclass = "ArtJenkinsTestResults"
             self.url = self.result.build_url
+
+        created = self._state.adding
+        if not created:
+            self.__load_saved__()
         super(TestJob, self).save(*args, **kwargs)
 
-        test_jobs = self.result.test_jobs
-        self.result.completed = (test_jobs.count() == test_jobs.filter(completed=True).count())
-        self.result.save()
+        if created:
+            total = 1
+            completed = int(self.completed)
+        else:
+            total = 0
+            completed = int(self.completed) - int(self.__saved_completed__)
+        self.__saved_completed__ = self.completed
+
+        if total or completed:
+            self.result.update_job_counters(total, completed)
+        else:
+            # saving a test job always touches its result (see
+            # Result.testjobs_updated)
+            Result.objects.filter(pk=self.result_id).update(updated_at=timezone.now())
+
+        if self.environment_id != self.__saved_environment_id__:
+            self.__saved_environment_id__ = self.environment_id
+            self.result.update_baseline()
+            self.result.offer_as_baseline(self.environment_id)
 
     class Meta:
         ordering = ['-created_at']
+        index_together = [
+            ["created_at", "id"],
+            ["completed", "next_poll_at"],
+        ]
 
     def __unicode__(self):
         return '<%s %s#%s %s>' % (self.id, self.result.build_id, self.result.name, self.status)
 
     def can_resubmit(self):
+        return self.is_resubmittable(self.id, self.status, self.resubmitted)
+
+    @staticmethod
+    def is_resubmittable(id, status, resubmitted):
         # check if job already was resubmitted
-        if self.resubmitted:
+        if resubmitted:
             return False
         # check status
-        if self.status in ['Complete', 'Running', 'Submitted', '']:
+        if status in ['Complete', 'Running', 'Submitted', '']:
             return False
         # check if this is single node
-        if '.' not in self.id:
+        if '.' not in id:
             return True
         # check if this is 'target' of multinode
         # assume that multinode jobs have the same ID before 'dot'
-        if self.id.split('.')[1] != "0" :
+        if id.split('.')[1] != "0" :
             return False
         return True
 
@@ -247,6 +370,24 @@ class TestJob(models.Model):
         return self.result.data.filter(test_job_id=self.id).prefetch_related('benchmark').order_by('benchmark__name', "name")
 
 
+@receiver(pre_delete, sender=TestJob, dispatch_uid='testjob-job-counters')
+def remove_from_job_counters(sender, instance, **kwargs):
+    instance.__load_saved__()
+    Result.objects.filter(pk=instance.result_id).update(
+        total_jobs=F('total_jobs') - 1,
+        completed_jobs=F('completed_jobs') - int(instance.__saved_completed__),
+    )
+
+
+@receiver(class_prepared, dispatch_uid='testjob-deferred-job-counters')
+def connect_deferred_testjob(sender, **kwargs):
+    # test jobs with deferred fields are deleted with a subclass as sender;
+    # connecting to every sender would disable fast deletes of all models
+    if sender._deferred and sender._meta.concrete_model is TestJob:
+        pre_delete.connect(remove_from_job_counters, sender=sender,
+                           dispatch_uid='testjob-job-counters-%s' % sender.__name__)
+
+
 class BenchmarkGroup(models.Model):
 
     name = models.CharField(max_length=128, unique=True)
@@ -289,12 +430,30 @@ class BenchmarkGroupSummary(models.Model):
     test_job_id = models.CharField(max_length=100, blank=False, null=True, db_index=True)
     created_at = models.DateTimeField(default=timezone.now, null=False)
     measurement = models.FloatField(null=False)
-    values = ArrayField(models.FloatField(), default=list)
 
-    def save(self, *args, **kwargs):
-        if self.values:
-            self.measurement = geomean(self.values)
-        super(BenchmarkGroupSummary, self).save(*args, **kwargs)
+    # sum of the logarithms of the (positive) values and how many of them
+    # there are, so that summaries can be combined without the raw values;
+    # see geomean() for why logarithms
+    log_sum = models.FloatField(default=0)
+    count = models.IntegerField(default=0)
+
+    def add_values(self, values):
+        for v in values:
+            if v > 0:
+                self.log_sum += log(v)
+                self.count += 1
+        self.calculate_measurement()
+
+    def merge(self, other):
+        self.log_sum += other.log_sum
+        self.count += other.count
+        self.calculate_measurement()
+
+    def calculate_measurement(self):
+        if self.count > 0:
+            self.measurement = exp(self.log_sum / self.count)
+        else:
+            self.measurement = 0
 
     @property
     def name(self):
@@ -345,7 +504,9 @@ class ResultData(models.Model):
         pvar = ss/n
         return pvar**0.5
 
-    def save(self, *args, **kwargs):
+    def calculate_statistics(self):
+        # save() is bypassed by bulk_create(), so bulk inserts must call this
+        # explicitly
         if self.measurement and not self.values:
             self.values = [self.measurement]
 
@@ -353,10 +514,87 @@ class ResultData(models.Model):
             self.measurement = self._mean(self.values)
             self.stdev = self._stddev(self.values)
 
-        return super(ResultData, self).save(*args, **kwargs)
+    def save(self, *args, **kwargs):
+        self.calculate_statistics()
+        created = self._state.adding
+        ret = super(ResultData, self).save(*args, **kwargs)
+        if created:
+            self.result.update_data_count(1)
+        return ret
 
     class Meta:
         ordering = ['-created_at']
 
     def __unicode__(self):
         return "%s - %s: %s" % (self.benchmark, self.name, self.measurement)
+
+
+class Rollup(models.Model):
+    """
+    Measurements of baseline builds aggregated per day or per week, so that
+    long-range charts don't need to read every raw row. Kept up to date by
+    benchmarks.rollups as test job results are stored.
+    """
+    DAY = 'day'
+    WEEK = 'week'
+    PERIODS = (
+        (DAY, 'Daily'),
+        (WEEK, 'Weekly'),
+    )
+
+    period = models.CharField(max_length=4, choices=PERIODS)
+    start = models.DateTimeField()
+    branch_name = models.CharField(max_length=128)
+    environment = models.ForeignKey(Environment, related_name='+')
+
+    # of the measurements in the period
+    count = models.IntegerField(default=0)
+    total = models.FloatField(default=0)
+    total_squares = models.FloatField(default=0)
+    minimum = models.FloatField(null=True)
+    maximum = models.FloatField(null=True)
+
+    # geometric mean inputs, as in BenchmarkGroupSummary
+    log_sum = models.FloatField(default=0)
+    log_count = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def mean(self):
+        if self.count == 0:
+            return 0
+        return self.total / self.count
+
+    @property
+    def stdev(self):
+        if self.count < 2:
+            return 0
+        variance = self.total_squares / self.count - self.mean ** 2
+        return max(variance, 0) ** 0.5
+
+    @property
+    def geomean(self):
+        if self.log_count == 0:
+            return 0
+        return exp(self.log_sum / self.log_count)
+
+
+class ResultDataRollup(Rollup):
+    benchmark = models.ForeignKey(Benchmark, related_name='+')
+    name = models.CharField(max_length=256)
+
+    class Meta:
+        unique_together = ('period', 'branch_name', 'environment', 'benchmark', 'name', 'start')
+
+
+class BenchmarkGroupSummaryRollup(Rollup):
+    group = models.ForeignKey(BenchmarkGroup, related_name='+')
+
+    class Meta:
+        unique_together = ('period', 'branch_name', 'environment', 'group', 'start')
+
+    @property
+    def name(self):
+        return "Geometric mean"
@@ -1,6 +1,6 @@
 # encoding=UTF-8
 
-from benchmarks.models import Environment, Result, TestJob
+from benchmarks.models import TestJob
 
 
 class Progress(object):
@@ -25,48 +25,43 @@ class Progress(object):
         return self.__str__()
 
 
-def get_values(queryset, field):
-    data = queryset.distinct(field).order_by(field).values(field)
-    return [item[field] for item in data]
+def get_last_testjobs(testjobs):
+    # the most recent test job per (project, branch, environment), with a
+    # single DISTINCT ON query
+    key = ('result__name', 'result__branch_name', 'environment_id')
+    last = testjobs.select_related('result', 'environment').order_by(
+        *(key + ('-created_at', '-id'))
+    ).distinct(*key)
+    return {(job.result.name, job.result.branch_name, job.environment_id): job for job in last}
 
 
 def get_progress_since(date):
     result = []
 
-    builds = Result.objects.filter(gerrit_change_number=None)  # only baseline
-    projects = get_values(builds, 'name')
-    branches = get_values(builds, 'branch_name')
-    environments = Environment.objects.all()
-
-    for project in projects:
-        for branch in branches:
-            for environment in environments:
-                testjobs = TestJob.objects.filter(
-                    environment=environment,
-                    result__branch_name=branch,
-                    result__name=project,
-                    result__gerrit_change_number=None, # only baseline builds
-                ).order_by('created_at')
-
-                after = testjobs.filter(created_at__gt=date).last()
-
-                if after is None:
-                    continue
-
-                before = testjobs.filter(created_at__lte=date).last()
-
-                if before is None:
-                    continue
-
-                progress = Progress(
-                    project=project,
-                    branch=branch,
-                    environment=environment,
-                    before=before,
-                    after=after,
-                )
+    testjobs = TestJob.objects.filter(
+        result__gerrit_change_number=None,  # only baseline builds
+        environment__isnull=False,
+    )
+
+    after = get_last_testjobs(testjobs.filter(created_at__gt=date))
+    if not after:
+        return result
+    before = get_last_testjobs(testjobs.filter(created_at__lte=date))
+
+    for key in sorted(after.keys()):
+        if key not in before:
+            continue
+
+        project, branch, _ = key
+        progress = Progress(
+            project=project,
+            branch=branch,
+            environment=after[key].environment,
+            before=before[key],
+            after=after[key],
+        )
 
-                result.append(progress)
+        result.append(progress)
 
     return result
 
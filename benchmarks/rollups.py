@@ -0,0 +1,206 @@
+"""
+Daily and weekly rollups of ResultData and BenchmarkGroupSummary for
+baseline builds (see models.Rollup).
+"""
+
+from datetime import timedelta
+from math import log
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from benchmarks.models import Rollup, ResultDataRollup, BenchmarkGroupSummaryRollup
+
+
+PERIODS = (Rollup.DAY, Rollup.WEEK)
+
+STATISTICS = ('count', 'total', 'total_squares', 'minimum', 'maximum', 'log_sum', 'log_count')
+
+
+def period_start(date, period):
+    # same as PostgreSQL's date_trunc(), in UTC
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    start = timezone.localtime(date, timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == Rollup.WEEK:
+        start -= timedelta(days=start.weekday())
+    return start
+
+
+class Statistics(object):
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.total_squares = 0
+        self.minimum = None
+        self.maximum = None
+        self.log_sum = 0
+        self.log_count = 0
+
+    def add(self, measurement, log_sum=None, log_count=None):
+        self.count += 1
+        self.total += measurement
+        self.total_squares += measurement ** 2
+        self.minimum = measurement if self.minimum is None else min(self.minimum, measurement)
+        self.maximum = measurement if self.maximum is None else max(self.maximum, measurement)
+        if log_sum is not None:
+            self.log_sum += log_sum
+            self.log_count += log_count
+        elif measurement > 0:
+            self.log_sum += log(measurement)
+            self.log_count += 1
+
+
+def __upsert__(model, keys, rows):
+    if not rows:
+        return
+
+    table = model._meta.db_table
+    columns = [model._meta.get_field(f).column for f in keys] + list(STATISTICS)
+    key_columns = columns[:len(keys)]
+
+    values = []
+    params = []
+    for key, stats in rows.items():
+        values.append('(%s)' % ', '.join(['%s'] * len(columns)))
+        params.extend(key)
+        params.extend(getattr(stats, s) for s in STATISTICS)
+
+    # no INSERT ... ON CONFLICT before PostgreSQL 9.5: update the rows that
+    # exist, then insert the others. The lock (held until the end of the
+    # ingestion transaction) keeps concurrent ingestions from inserting the
+    # same rows in between; reads are not blocked.
+    names = dict(
+        table=table,
+        columns=', '.join(columns),
+        v_columns=', '.join('v.' + c for c in columns),
+        values=', '.join(values),
+        matches=' AND '.join('t.{0} = v.{0}'.format(c) for c in key_columns),
+    )
+    update_sql = """
+        UPDATE {table} t SET
+            count = t.count + v.count,
+            total = t.total + v.total,
+            total_squares = t.total_squares + v.total_squares,
+            minimum = LEAST(t.minimum, v.minimum),
+            maximum = GREATEST(t.maximum, v.maximum),
+            log_sum = t.log_sum + v.log_sum,
+            log_count = t.log_count + v.log_count
+        FROM (VALUES {values}) AS v ({columns})
+        WHERE {matches}
+    """.format(**names)
+    insert_sql = """
+        INSERT INTO {table} ({columns})
+        SELECT {v_columns}
+        FROM (VALUES {values}) AS v ({columns})
+        WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE {matches})
+    """.format(**names)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('LOCK TABLE %s IN SHARE ROW EXCLUSIVE MODE' % table)
+            cursor.execute(update_sql, params)
+            cursor.execute(insert_sql, params)
+
+
+def update(testjob, result_data, summaries):
+    """
+    Adds the given ResultData and BenchmarkGroupSummary objects, all from
+    `testjob`, to the rollups. Only baseline builds with a known
+    environment are rolled up.
+    """
+    result = testjob.result
+    if result.gerrit_change_number is not None or testjob.environment_id is None:
+        return
+
+    common = (result.branch_name, testjob.environment_id)
+
+    data_rows = {}
+    summary_rows = {}
+    for period in PERIODS:
+        start = period_start(testjob.created_at, period)
+        for data in result_data:
+            key = (period, start) + common + (data.benchmark_id, data.name)
+            data_rows.setdefault(key, Statistics()).add(data.measurement)
+        for summary in summaries:
+            key = (period, start) + common + (summary.group_id,)
+            summary_rows.setdefault(key, Statistics()).add(summary.measurement, summary.log_sum, summary.count)
+
+    common_keys = ('period', 'start', 'branch_name', 'environment')
+    __upsert__(ResultDataRollup, common_keys + ('benchmark', 'name'), data_rows)
+    __upsert__(BenchmarkGroupSummaryRollup, common_keys + ('group',), summary_rows)
+
+
+def rebuild():
+    """
+    Recreates all rollups from ResultData and BenchmarkGroupSummary, with
+    one INSERT ... SELECT per table and period.
+    """
+    ResultDataRollup.objects.all().delete()
+    BenchmarkGroupSummaryRollup.objects.all().delete()
+
+    data_sql = """
+        INSERT INTO benchmarks_resultdatarollup
+            (period, start, branch_name, environment_id, benchmark_id, name,
+             count, total, total_squares, minimum, maximum, log_sum, log_count)
+        SELECT %s, date_trunc(%s, d.created_at), r.branch_name, j.environment_id, d.benchmark_id, d.name,
+               COUNT(*), SUM(d.measurement), SUM(d.measurement ^ 2), MIN(d.measurement), MAX(d.measurement),
+               COALESCE(SUM(CASE WHEN d.measurement > 0 THEN LN(d.measurement) END), 0),
+               COUNT(CASE WHEN d.measurement > 0 THEN 1 END)
+        FROM benchmarks_resultdata d
+        JOIN benchmarks_result r ON r.id = d.result_id
+        JOIN benchmarks_testjob j ON j.id = d.test_job_id
+        WHERE r.gerrit_change_number IS NULL AND j.environment_id IS NOT NULL
+        GROUP BY 2, r.branch_name, j.environment_id, d.benchmark_id, d.name
+    """
+    summary_sql = """
+        INSERT INTO benchmarks_benchmarkgroupsummaryrollup
+            (period, start, branch_name, environment_id, group_id,
+             count, total, total_squares, minimum, maximum, log_sum, log_count)
+        SELECT %s, date_trunc(%s, s.created_at), r.branch_name, s.environment_id, s.group_id,
+               COUNT(*), SUM(s.measurement), SUM(s.measurement ^ 2), MIN(s.measurement), MAX(s.measurement),
+               SUM(s.log_sum), SUM(s.count)
+        FROM benchmarks_benchmarkgroupsummary s
+        JOIN benchmarks_result r ON r.id = s.result_id
+        WHERE r.gerrit_change_number IS NULL AND s.environment_id IS NOT NULL
+        GROUP BY 2, r.branch_name, s.environment_id, s.group_id
+    """
+    with connection.cursor() as cursor:
+        for period in PERIODS:
+            cursor.execute(data_sql, [period, period])
+            cursor.execute(summary_sql, [period, period])
+
+
+def in_range(queryset, start=None, end=None):
+    """
+    Filters rollups of any period down to the ones that overlap the given
+    range.
+    """
+    if start:
+        overlaps = Q()
+        for period in PERIODS:
+            overlaps |= Q(period=period, start__gte=period_start(start, period))
+        queryset = queryset.filter(overlaps)
+    if end:
+        queryset = queryset.filter(start__lt=end)
+    return queryset
+
+
+def choose_period(rollups, series, max_points):
+    """
+    Given the rollups (of all periods) for the requested range, returns the
+    finest period that fits in `max_points` per series, or None if the raw
+    data already does. `series` are the fields that tell series apart.
+    """
+    daily = rollups.filter(period=Rollup.DAY).values(*series).annotate(
+        points=Count('id'),
+        raw=Sum('count'),
+    ).order_by()
+    sizes = daily.aggregate(Max('points'), Max('raw'))
+    if not sizes['raw__max'] or sizes['raw__max'] <= max_points:
+        return None
+    if sizes['points__max'] <= max_points:
+        return Rollup.DAY
+    return Rollup.WEEK
@@ -0,0 +1,174 @@
+"""
+Content-addressed, optionally gzip-compressed storage for TestJob.data
+(see TESTJOB_DATA_COMPRESS).
+"""
+
+import errno
+import gzip
+import hashlib
+import os
+import shutil
+import struct
+import tempfile
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    prefix = 'blobs'
+
+    def __init__(self, location=None, base_url=None, compress=None, **kwargs):
+        super(ContentAddressedStorage, self).__init__(location, base_url, **kwargs)
+        self.compress = compress
+
+    def __compressing__(self):
+        if self.compress is None:
+            return settings.TESTJOB_DATA_COMPRESS
+        return self.compress
+
+    def __local__(self, name):
+        return super(ContentAddressedStorage, self).path(name)
+
+    def __compressed__(self, name):
+        # path of the compressed blob, or None if `name` is stored as is
+        path = self.__local__(name + '.gz')
+        if os.path.exists(path):
+            return path
+        return None
+
+    def get_available_name(self, name, max_length=None):
+        # names are chosen by _save(), from the content
+        return name
+
+    def _save(self, name, content):
+        directory = self.__local__(self.prefix)
+        self.__makedirs__(directory)
+        compress = self.__compressing__()
+
+        # hash and (maybe) compress in a single pass, into a temporary file
+        # that becomes the blob
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as raw:
+                out = gzip.GzipFile(filename='', fileobj=raw, mode='wb', mtime=0) if compress else raw
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    out.write(chunk)
+                if compress:
+                    out.close()
+
+            h = digest.hexdigest()
+            name = '%s/%s/%s%s' % (self.prefix, h[:2], h, os.path.splitext(name)[1])
+            if self.exists(name):
+                os.remove(tmp)
+            else:
+                path = self.__local__(name + '.gz' if compress else name)
+                self.__makedirs__(os.path.dirname(path))
+                os.rename(tmp, path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(path, self.file_permissions_mode)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return name
+
+    def __makedirs__(self, directory):
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def _open(self, name, mode='rb'):
+        path = self.__compressed__(name)
+        if path is None:
+            return super(ContentAddressedStorage, self)._open(name, mode)
+        return File(gzip.open(path, 'rb'), name)
+
+    def exists(self, name):
+        return os.path.exists(self.__local__(name)) or self.__compressed__(name) is not None
+
+    def size(self, name):
+        path = self.__compressed__(name)
+        if path is None:
+            return super(ContentAddressedStorage, self).size(name)
+        # gzip keeps the uncompressed size (modulo 2**32) in its last 4 bytes
+        with open(path, 'rb') as f:
+            f.seek(-4, os.SEEK_END)
+            return struct.unpack('<I', f.read(4))[0]
+
+    def disk_size(self, name):
+        return os.path.getsize(self.__compressed__(name) or self.__local__(name))
+
+    def delete(self, name):
+        # blobs are shared by all test jobs with the same content: only
+        # delete one that none of them refers to anymore
+        path = self.__compressed__(name)
+        if path is not None:
+            os.remove(path)
+        else:
+            super(ContentAddressedStorage, self).delete(name)
+
+    def path(self, name):
+        if self.__compressed__(name) is not None:
+            raise NotImplementedError("%s is compressed, so it has no usable local path" % name)
+        return self.__local__(name)
+
+    def content_hash(self, name):
+        """
+        SHA-256 of the content of `name`, if it is a blob, or None.
+        """
+        if not name.startswith(self.prefix + '/'):
+            return None
+        return os.path.splitext(os.path.basename(name))[0]
+
+    def usage(self, names):
+        """
+        Given the names of all stored files in use, one per reference,
+        returns the bytes they would take if each reference had its own
+        uncompressed copy, and the bytes they actually take on disk.
+        """
+        logical = 0
+        physical = 0
+        seen = set()
+        for name in names:
+            logical += self.size(name)
+            if name not in seen:
+                seen.add(name)
+                physical += self.disk_size(name)
+        return logical, physical
+
+
+@contextmanager
+def local_copy(fieldfile):
+    """
+    Yields the path of a plain local file with the content of `fieldfile`:
+    the stored file itself if possible, or else a temporary copy, for
+    external programs to read.
+    """
+    try:
+        path = fieldfile.path
+    except NotImplementedError:
+        path = None
+
+    if path is not None:
+        yield path
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=os.path.splitext(fieldfile.name)[1]) as copy:
+        f = fieldfile.storage.open(fieldfile.name, 'rb')
+        try:
+            shutil.copyfileobj(f, copy)
+        finally:
+            f.close()
+        copy.flush()
+        yield copy.name
@@ -1,4 +1,5 @@
 import os
+import random
 import urlparse
 import re
 import requests
@@ -6,10 +7,12 @@ import subprocess
 import traceback
 
 from collections import defaultdict
+from datetime import timedelta
 from dateutil.relativedelta import relativedelta
 from urllib import urlencode
 
 from django.conf import settings
+from django.db import transaction, IntegrityError
 from django.utils import timezone
 from django.core.files.base import ContentFile
 from django.template.loader import render_to_string
@@ -18,86 +21,71 @@ from celery.utils.log import get_task_logger
 
 from crayonbox import celery_app
 
-from . import models, testminer, mail, gerrit, progress
+from . import models, testminer, mail, gerrit, progress, ingestion, identity, locks, diskcache, bundles
 
 logger = get_task_logger("tasks")
 
+# LAVA job statuses after which the job will not change anymore
+TERMINAL_STATUSES = ["Complete", "Incomplete", "Canceled"]
+
+# status of jobs that did not finish within TESTJOB_POLL_HORIZON
+ABANDONED = "Abandoned"
+
 
 @celery_app.task(bind=True)
 def set_testjob_results(self, testjob_id):
-    testjob = models.TestJob.objects.get(pk=testjob_id)
-    try:
-        test_results = get_testjob_data(testjob)
-        store_testjob_data(testjob, test_results)
-    except testminer.LavaServerException as ex:
-        if ex.status_code / 100 == 5:
-            # HTTP 50x (internal server errors): server is too busy, in
-            # maintaince, or broken; will try again later
-            logger.info(ex.message)
+    with locks.testjob_lock(testjob_id) as locked:
+        if not locked:
+            # another worker is fetching this job already
+            locks.skipped.add(testjob_id)
             return
-        else:
-            raise
+
+        testjob = models.TestJob.objects.get(pk=testjob_id)
+        if testjob.results_loaded:
+            # queued again after its results were loaded (by the worker that
+            # held the lock, maybe): don't fetch them again
+            ingestion.duplicates.add(testjob)
+            return
+        try:
+            test_results = get_testjob_data(testjob)
+            store_testjob_data(testjob, test_results)
+        except testminer.LavaServerException as ex:
+            if ex.status_code / 100 == 5:
+                # HTTP 50x (internal server errors): server is too busy, in
+                # maintaince, or broken; will try again later
+                logger.info(ex.message)
+                return
+            else:
+                raise
 
 def store_testjob_data(testjob, test_results):
-    testjob.save()
+    if testjob._state.adding:
+        testjob.save()
+    else:
+        # check_testjob_completeness may have rescheduled the job while its
+        # results were being fetched; keep its schedule
+        testjob.save(update_fields=[
+            f.name for f in testjob._meta.concrete_fields
+            if not f.primary_key and f.name not in ('next_poll_at', 'poll_attempts')
+        ])
 
     if testjob.results_loaded:
+        if test_results and testjob.results_fingerprint == ingestion.fingerprint(test_results):
+            ingestion.duplicates.add(testjob)
         return
 
     if not test_results:
         return
 
-    summary = defaultdict(lambda: [])
-
-    root_group, _ = models.BenchmarkGroup.objects.get_or_create(name='/')
-
-    for result in test_results:
-        if 'benchmark_group' in result:
-            benchmark_group, _ = models.BenchmarkGroup.objects.get_or_create(
-                name=result['benchmark_group']
-            )
-        else:
-            benchmark_group = None
-        benchmark, _ = models.Benchmark.objects.get_or_create(
-            name=result['benchmark_name'],
-            group=benchmark_group,
-        )
-
-        subscore_results = {}
-        for item in result['subscore']:
-            if item['name'] in subscore_results:
-                subscore_results[item['name']].append(item['measurement'])
-            else:
-                subscore_results[item['name']] = [item['measurement']]
-
-        for name, values in subscore_results.items():
-            models.ResultData.objects.create(
-                name=name,
-                created_at=testjob.created_at,
-                values=values,
-                result=testjob.result,
-                test_job_id=testjob.id,
-                benchmark=benchmark
-            )
-            if benchmark_group:
-                for v in values:
-                    summary[benchmark_group.id].append(v)
-                    summary[root_group.id].append(v)
-
-    for (gid, values) in summary.items():
-        group = models.BenchmarkGroup.objects.get(pk=gid)
-        models.BenchmarkGroupSummary.objects.create(
-            group=group,
-            environment=testjob.environment,
-            created_at=testjob.created_at,
-            result=testjob.result,
-            test_job_id=testjob.id,
-            values=values,
-        )
-
-
-    testjob.results_loaded = True
-    testjob.save()
+    try:
+        ingestion.store_test_results(testjob, test_results)
+    except IntegrityError:
+        if transaction.get_connection().in_atomic_block:
+            raise
+        # a cached benchmark or group id may have been deleted by another
+        # process; start over from the database
+        identity.clear()
+        ingestion.store_test_results(testjob, test_results)
 
 
 def get_testjob_data(testjob):
@@ -116,11 +104,13 @@ def get_testjob_data(testjob):
     if not testjob.initialized:
         testjob.testrunnerclass = tester.get_result_class_name(testjob.id)
         testjob.initialized = True
+        generic_tester = tester
         tester = getattr(testminer, testjob.testrunnerclass)(
             testjob.testrunnerurl, username, password
         )
+        tester.reuse_responses(generic_tester)
 
-    if testjob.status not in ["Complete", "Incomplete", "Canceled"]:
+    if testjob.status not in TERMINAL_STATUSES:
         logger.debug("Job({0}) status: {1}".format(testjob.id, testjob.status))
         return
 
@@ -128,7 +118,11 @@ def get_testjob_data(testjob):
     testjob.definition = details['definition']
     testjob.metadata = details['metadata']
     testjob.name = details['name']
-    testjob.environment = tester.get_environment(testjob.metadata, models.Environment)
+    environment = tester.get_environment_name(testjob.metadata)
+    if environment:
+        testjob.environment_id = identity.environments.get_id(environment)
+    else:
+        testjob.environment_id = None
     testjob.completed = True
     logger.debug("Test job({0}) completed: {1}".format(testjob.id, testjob.completed))
     if testjob.status in ["Incomplete", "Canceled"]:
@@ -173,14 +167,113 @@ def get_testjob_data(testjob):
     return test_results
 
 
+def poll_lava_statuses(url, testjob_ids):
+    """
+    Returns a dictionary mapping the given LAVA job ids to their status,
+    fetched from the server at `url` with batched system.multicall requests.
+    Jobs whose status could not be fetched are left out.
+    """
+    netloc = urlparse.urlsplit(url).netloc
+    if netloc not in settings.CREDENTIALS:
+        logger.error("No credentials found for %s" % netloc)
+        return {}
+    username, password = settings.CREDENTIALS[netloc]
+    tester = testminer.GenericLavaTestSystem(url, username, password)
+
+    statuses = {}
+    size = settings.LAVA_MULTICALL_SIZE
+    for i in range(0, len(testjob_ids), size):
+        batch = testjob_ids[i:i + size]
+        try:
+            results = tester.multicall(
+                [('scheduler.job_status', (job_id,)) for job_id in batch],
+                return_errors=True,
+            )
+        except (testminer.LavaServerException, requests.RequestException) as ex:
+            logger.info("Could not poll %s: %s" % (url, ex))
+            continue
+        for job_id, result in zip(batch, results):
+            if isinstance(result, dict) and 'job_status' in result:
+                statuses[job_id] = result['job_status']
+    return statuses
+
+
+def poll_delay(status, age, attempts):
+    """
+    Time to wait before polling again a job with the given status and age
+    (a timedelta), polled `attempts` times since its status last changed.
+    """
+    interval = settings.TESTJOB_POLL_INTERVALS.get(status, settings.TESTJOB_POLL_INTERVAL)
+    delay = interval * 2 ** min(attempts, 16)
+    # a job that has been waiting for days will hardly finish in the next
+    # few minutes, whatever its status
+    delay = max(delay, age.total_seconds() / 10)
+    delay = min(delay, settings.TESTJOB_POLL_MAX_INTERVAL)
+    jitter = settings.TESTJOB_POLL_JITTER
+    return timedelta(seconds=delay * random.uniform(1 - jitter, 1 + jitter))
+
+
 @celery_app.task(bind=True)
 def check_testjob_completeness(self):
-    incompleted = models.TestJob.objects.filter(completed=False)
+    """
+    Polls the status of the incomplete test jobs that are due (see
+    TestJob.next_poll_at), with one batch of requests per LAVA server, and
+    only fetches the results of the ones that finished. Jobs that are not
+    run by LAVA, or whose status could not be polled, are fetched as before.
+    LAVA jobs past TESTJOB_POLL_HORIZON that are known to be still queued or
+    running are abandoned instead.
+    """
+    now = timezone.now()
+    due = list(models.TestJob.objects.filter(completed=False, next_poll_at__lte=now).values_list(
+        'id', 'testrunnerclass', 'testrunnerurl', 'status', 'created_at', 'poll_attempts'))
+
+    servers = defaultdict(list)
+    for testjob_id, testrunnerclass, testrunnerurl, _, _, _ in due:
+        tester_class = getattr(testminer, testrunnerclass, None)
+        if tester_class and issubclass(tester_class, testminer.GenericLavaTestSystem):
+            servers[testrunnerurl].append(testjob_id)
+
+    statuses = {}
+    for url, testjob_ids in servers.items():
+        statuses.update(poll_lava_statuses(url, testjob_ids))
+
+    horizon = now - timedelta(seconds=settings.TESTJOB_POLL_HORIZON)
+    fetch = []
+    abandoned = []
+    for testjob_id, _, _, old_status, created_at, attempts in due:
+        status = statuses.get(testjob_id)
+        finished = status in TERMINAL_STATUSES
+        # a job whose status is unknown (the poll failed, or it is not run
+        # by LAVA) is never abandoned
+        if created_at < horizon and status is not None and not finished:
+            abandoned.append(testjob_id)
+            continue
+        if status is None or finished:
+            fetch.append(testjob_id)
+
+        changes = {}
+        if status is not None and status != old_status:
+            attempts = 0
+            if not finished:
+                changes['status'] = status
+        else:
+            attempts += 1
+        # also for the jobs being fetched, in case fetching fails
+        changes['poll_attempts'] = attempts
+        changes['next_poll_at'] = now + poll_delay(status or old_status, now - created_at, attempts)
+        models.TestJob.objects.filter(pk=testjob_id).update(**changes)
 
-    logger.info("Fetch incomplete TestJobs results, count=%s" % incompleted.count())
+    # saved one by one to keep the counters of their results up to date
+    for testjob in models.TestJob.objects.filter(pk__in=abandoned).select_related('result'):
+        testjob.status = ABANDONED
+        testjob.completed = True
+        testjob.save(update_fields=['status', 'completed', 'updated_at'])
 
-    for testjob in models.TestJob.objects.filter(completed=False):
-        set_testjob_results.apply_async(args=[testjob.id])
+    logger.info("Polled %d due TestJobs on %d LAVA servers, fetching results for %d, abandoned %d" % (
+        len(due), len(servers), len(fetch), len(abandoned)))
+
+    for testjob_id in fetch:
+        set_testjob_results.apply_async(args=[testjob_id])
 
 
 @celery_app.task(bind=True)
@@ -318,6 +411,13 @@ def sync_external_repos(self):
     _sync_external_repos()
 
 
+@celery_app.task(bind=True)
+def prune_disk_caches(self):
+    if settings.COMPARISON_CACHE_DIR:
+        diskcache.evict(settings.COMPARISON_CACHE_DIR, settings.COMPARISON_CACHE_SIZE)
+    bundles.evict()
+
+
 @celery_app.task(bind=True)
 def daily_benchmark_progress(self):
     now = timezone.now()
@@ -7,6 +7,7 @@ import requests
 import shutil
 import subprocess
 import sys
+import threading
 import xmlrpclib
 import yaml
 import tempfile
@@ -15,6 +16,7 @@ from jenkinsapi import jenkins
 from urlparse import urlsplit
 from subprocess import Popen, PIPE, STDOUT
 
+from benchmarks import bundles
 from benchmarks.metadata import extract_metadata, extract_name, extract_device
 
 from celery.utils.log import get_task_logger
@@ -141,6 +143,13 @@ class TestSystem(object):
     def get_environment_name(self, metadata):
         return None
 
+    def reuse_responses(self, other):
+        """
+        Lets this tester reuse the server responses already fetched by
+        `other`, another tester for the same job.
+        """
+        return None
+
     def get_environment(self, metadata, cls):
         name = self.get_environment_name(metadata)
         if name:
@@ -265,10 +274,35 @@ class LavaResponseException(Exception):
     pass
 
 
+# one HTTP session per LAVA server, shared by all testers in the process, so
+# that connections are kept alive and reused
+LAVA_POOL_SIZE = 10
+
+__sessions__ = {}
+__sessions_lock__ = threading.Lock()
+
+
+def lava_session(url):
+    with __sessions_lock__:
+        session = __sessions__.get(url)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=LAVA_POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            __sessions__[url] = session
+        return session
+
+
 class GenericLavaTestSystem(TestSystem):
     XMLRPC = 'RPC2/'
     BUNDLESTREAMS = 'dashboard/streams'
     JOB = 'scheduler/job'
+
+    # read-only calls whose results are kept for the lifetime of the tester,
+    # i.e. a single task
+    MEMOIZED = ('scheduler.job_status', 'scheduler.job_details', 'dashboard.get')
+
     def __init__(self, base_url, username=None, password=None, repo_prefix=None):
         self.url = base_url
         self.username = username # API username
@@ -277,6 +311,11 @@ class GenericLavaTestSystem(TestSystem):
         self.stream_url = base_url + LavaTestSystem.BUNDLESTREAMS
         self._url = base_url + LavaTestSystem.JOB
         self.result_data = None
+        self.__memo__ = {}
+
+    def reuse_responses(self, other):
+        if isinstance(other, GenericLavaTestSystem) and other.xmlrpc_url == self.xmlrpc_url:
+            self.__memo__ = other.__memo__
 
     def test_results_available(self, job_id):
         status = self.call_xmlrpc('scheduler.job_status', job_id)
@@ -295,10 +334,12 @@ class GenericLavaTestSystem(TestSystem):
         the tests were run on
         """
         details = dict(testertype="lava")
-        status = self.call_xmlrpc('scheduler.job_status', job_id)
+        status, content = self.multicall([
+            ('scheduler.job_status', (job_id,)),
+            ('scheduler.job_details', (job_id,)),
+        ])
         if 'bundle_sha1' in status:
             details.update({"bundle": status['bundle_sha1']})
-        content = self.call_xmlrpc('scheduler.job_details', job_id)
         definition = json.loads(content['definition'])
         if content['multinode_definition']:
             definition = json.loads(content['multinode_definition'])
@@ -336,15 +377,14 @@ class GenericLavaTestSystem(TestSystem):
                                 return "AndroidCtsTestResults"
         return "GenericLavaTestSystem"
 
-    def call_xmlrpc(self, method_name, *method_params):
-        payload = xmlrpclib.dumps((method_params), method_name)
-
-        response = requests.request('POST', self.xmlrpc_url,
-                                    data = payload,
-                                    headers = {'Content-Type': 'application/xml'},
-                                    auth = (self.username, self.password),
-                                    timeout = 100,
-                                    stream = False)
+    def __post__(self, payload):
+        response = lava_session(self.xmlrpc_url).post(
+            self.xmlrpc_url,
+            data = payload,
+            headers = {'Content-Type': 'application/xml'},
+            auth = (self.username, self.password),
+            timeout = 100,
+            stream = False)
 
         if response.status_code == 200:
             try:
@@ -357,6 +397,80 @@ class GenericLavaTestSystem(TestSystem):
         else:
             raise LavaServerException(self.xmlrpc_url, response.status_code)
 
+    def __remember__(self, method_name, method_params, result):
+        if method_name in self.MEMOIZED:
+            self.__memo__[(method_name, method_params)] = result
+
+    def call_xmlrpc(self, method_name, *method_params):
+        key = (method_name, method_params)
+        if key in self.__memo__:
+            return self.__memo__[key]
+
+        payload = xmlrpclib.dumps((method_params), method_name)
+        result = self.__post__(payload)
+        self.__remember__(method_name, method_params, result)
+        return result
+
+    def multicall(self, calls, return_errors=False):
+        """
+        Makes several calls, given as (method_name, params) pairs, in a single
+        round trip with system.multicall, and returns their results in the
+        same order. Memoized results are not fetched again.
+
+        A call that fails raises LavaResponseException, unless `return_errors`
+        is True, in which case the exception is returned as its result.
+        """
+        calls = [(method_name, tuple(params)) for method_name, params in calls]
+        pending = [c for c in calls if c not in self.__memo__]
+        fetched = {}
+
+        items = None
+        if len(pending) > 1:
+            payload = xmlrpclib.dumps(([
+                {'methodName': method_name, 'params': list(params)}
+                for method_name, params in pending
+            ],), 'system.multicall')
+            try:
+                items = self.__post__(payload)
+            except LavaResponseException:
+                # no system.multicall on this server
+                items = None
+
+        if items is None:
+            for call in pending:
+                try:
+                    fetched[call] = self.call_xmlrpc(call[0], *call[1])
+                except LavaResponseException as e:
+                    fetched[call] = e
+        else:
+            for call, item in zip(pending, items):
+                if isinstance(item, dict) and 'faultCode' in item:
+                    fetched[call] = LavaResponseException(
+                        "Fault code: %d, Fault string: %s\n %s%r" % (
+                            item['faultCode'], item['faultString'], call[0], call[1]))
+                else:
+                    fetched[call] = item[0]
+                    self.__remember__(call[0], call[1], item[0])
+
+        results = []
+        for call in calls:
+            result = self.__memo__[call] if call in self.__memo__ else fetched[call]
+            if isinstance(result, LavaResponseException) and not return_errors:
+                raise result
+            results.append(result)
+        return results
+
+    def get_bundle(self, sha1):
+        """
+        Returns the parsed dashboard bundle with the given SHA1, from the
+        local bundle cache if it is there.
+        """
+        content = bundles.get(sha1)
+        if content is None:
+            content = self.call_xmlrpc('dashboard.get', sha1)['content']
+            bundles.put(sha1, content)
+        return json.loads(content)
+
     def get_environment_name(self, metadata):
         return metadata.get('device')
 
@@ -562,8 +676,7 @@ class LavaTestSystem(GenericLavaTestSystem):
                     for test in extracted_tests: defined_tests.append(test)
 
         if sha1:
-            result_bundle = self.call_xmlrpc('dashboard.get', sha1)
-            bundle = json.loads(result_bundle['content'])
+            bundle = self.get_bundle(sha1)
             for run in iter(bundle['test_runs']):
                 test_results = run['test_results']
                 if run['test_id'] != 'lava':
@@ -728,8 +841,7 @@ class ArtMicrobenchmarksTestResults(LavaTestSystem):
             return (None, None)
 
         sha1 = status['bundle_sha1']
-        result_bundle = self.call_xmlrpc('dashboard.get', sha1)
-        bundle = json.loads(result_bundle['content'])
+        bundle = self.get_bundle(sha1)
 
         host = [t for t in bundle['test_runs'] if t['test_id'] == 'art-microbenchmarks']
         if host:
@@ -798,8 +910,7 @@ class ArtWATestResults(LavaTestSystem):
             return (None, None)
 
         sha1 = status['bundle_sha1']
-        result_bundle = self.call_xmlrpc('dashboard.get', sha1)
-        bundle = json.loads(result_bundle['content'])
+        bundle = self.get_bundle(sha1)
 
         host = [t for t in bundle['test_runs'] if t['test_id'] == 'wa2-host-postprocessing']
         if host:
@@ -829,8 +940,7 @@ class AndroidMultinodeBenchmarkResults(LavaTestSystem):
             return []
 
         sha1 = status['bundle_sha1']
-        result_bundle = self.call_xmlrpc('dashboard.get', sha1)
-        bundle = json.loads(result_bundle['content'])
+        bundle = self.get_bundle(sha1)
 
         target = [t for t in bundle['test_runs'] if t['test_id'] in ['multinode-target', 'lava-android-benchmark-target', 'target-stop']]
         if target:
@@ -2,23 +2,38 @@ from django.test import TestCase
 
 from benchmarks.models import Result, BenchmarkGroup
 from benchmarks.models import BenchmarkGroupSummary
-from django_dynamic_fixture import G
+from django_dynamic_fixture import G, N
 
 from benchmarks.testing import MANIFEST
 
 class BenchmarkGroupSummaryTest(TestCase):
 
-    def test_geomean(self):
+    def summary(self, values):
         result = G(Result, manifest=MANIFEST())
-        progress = G(BenchmarkGroupSummary, values=[1,2], result=result)
+        progress = N(BenchmarkGroupSummary, result=result, log_sum=0, count=0)
+        progress.add_values(values)
+        progress.save()
+        return progress
+
+    def test_geomean(self):
+        progress = self.summary([1,2])
         self.assertAlmostEqual(1.4142, progress.measurement, delta=0.0001)
 
     def test_geomean_with_zeros(self):
-        result = G(Result, manifest=MANIFEST())
-        progress = G(BenchmarkGroupSummary, values=[1,2,0], result=result)
+        progress = self.summary([1,2,0])
         self.assertAlmostEqual(1.4142, progress.measurement, delta=0.0001)
 
     def test_geomean_with_only_zeros(self):
-        result = G(Result, manifest=MANIFEST())
-        progress = G(BenchmarkGroupSummary, values=[0,0,0], result=result)
+        progress = self.summary([0,0,0])
         self.assertAlmostEqual(0, progress.measurement, delta=0.0001)
+
+    def test_merge(self):
+        progress = self.summary([1, 2])
+        progress.merge(self.summary([4, 8]))
+        self.assertEqual(progress.count, 4)
+        self.assertAlmostEqual(64 ** 0.25, progress.measurement, delta=0.0001)
+
+    def test_explicit_measurement_is_kept(self):
+        result = G(Result, manifest=MANIFEST())
+        progress = G(BenchmarkGroupSummary, result=result, measurement=3)
+        self.assertEqual(3, BenchmarkGroupSummary.objects.get(pk=progress.pk).measurement)
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase
+from mock import patch
+
+from benchmarks import bundles
+from benchmarks.tasks import prune_disk_caches
+
+
+class BundleCacheTest(TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.patch = patch('django.conf.settings.BUNDLE_CACHE_DIR', self.cache_dir)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        shutil.rmtree(self.cache_dir)
+
+    def age(self, sha1, seconds):
+        path = bundles.bundle_path(sha1)
+        mtime = os.stat(path).st_mtime - seconds
+        os.utime(path, (mtime, mtime))
+
+    def test_round_trip(self):
+        bundles.put('abc123', u'{"test_runs": []}')
+        self.assertEqual(u'{"test_runs": []}', bundles.get('abc123'))
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir, 'ab', 'abc123')))
+
+    def test_not_cached(self):
+        self.assertIsNone(bundles.get('abc123'))
+
+    def test_only_hex_keys(self):
+        bundles.put('../abc', u'{}')
+        self.assertIsNone(bundles.get('../abc'))
+        self.assertEqual([], os.listdir(self.cache_dir))
+
+    def test_disabled(self):
+        with patch('django.conf.settings.BUNDLE_CACHE_DIR', None):
+            bundles.put('abc123', u'{}')
+            self.assertIsNone(bundles.get('abc123'))
+
+    @patch('django.conf.settings.BUNDLE_CACHE_SIZE', 10)
+    def test_evicts_least_recently_used(self):
+        bundles.put('aa', u'1234')
+        self.age('aa', 30)
+        bundles.put('bb', u'1234')
+        self.age('bb', 20)
+        bundles.put('cc', u'1234')
+        self.age('cc', 10)
+        # reading marks as recently used
+        bundles.get('aa')
+
+        # storing does not evict
+        self.assertTrue(os.path.exists(bundles.bundle_path('bb')))
+
+        prune_disk_caches.apply()
+
+        self.assertEqual(u'1234', bundles.get('aa'))
+        self.assertIsNone(bundles.get('bb'))
+        self.assertEqual(u'1234', bundles.get('cc'))
+
+    def test_put_does_not_fail(self):
+        with patch('benchmarks.diskcache.write', side_effect=OSError(28, 'No space left on device')):
+            bundles.put('abc123', u'{}')
+        self.assertIsNone(bundles.get('abc123'))
@@ -1,12 +1,15 @@
 import os
+import shutil
+import tempfile
 from dateutil.relativedelta import relativedelta
 from django_dynamic_fixture import G
 from django.test import TestCase
 from django.utils import timezone
+from mock import patch
 
 from benchmarks.tests import get_file
-from benchmarks.models import Result, ResultData, TestJob
-from benchmarks.comparison import render_comparison
+from benchmarks.models import Benchmark, Result, ResultData, TestJob
+from benchmarks.comparison import compare, comparison_key, compare_script_revision, render_comparison, render_comparisons
 
 from benchmarks.testing import MANIFEST
 
@@ -50,3 +53,99 @@ class ComparisonTest(TestCase):
 
         output = render_comparison(testjob_then, testjob_now)
         self.assertTrue("benchmark1" in output)
+
+
+class CompareTest(TestCase):
+
+    def setUp(self):
+        result_before = G(Result, manifest=MANIFEST())
+        result_after = G(Result, manifest=MANIFEST())
+        self.before = G(TestJob, result=result_before)
+        self.after = G(TestJob, result=result_after)
+
+    def __data__(self, testjob, benchmark, name, measurement):
+        return G(ResultData, result=testjob.result, test_job_id=testjob.id,
+                 benchmark=benchmark, name=name, measurement=measurement)
+
+    def test_compare(self):
+        load = G(Benchmark, name='load')
+        boot = G(Benchmark, name='boot')
+        self.__data__(self.before, load, 'load-avg', 10)
+        self.__data__(self.before, boot, 'load-avg', 1)
+        self.__data__(self.after, load, 'load-avg', 15)
+        self.__data__(self.after, boot, 'time', 2)
+
+        result = compare(self.before, self.after)
+
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0]['current'].benchmark, load)
+        self.assertEqual(result[0]['previous'].measurement, 10)
+        self.assertAlmostEqual(result[0]['change'], 50)
+
+    def test_compare_skips_ambiguous_previous(self):
+        load = G(Benchmark, name='load')
+        self.__data__(self.before, load, 'load-avg', 10)
+        self.__data__(self.before, load, 'load-avg', 20)
+        self.__data__(self.after, load, 'load-avg', 15)
+
+        self.assertEqual(compare(self.before, self.after), [])
+
+
+class RenderComparisonsTest(TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        result = G(Result, manifest=MANIFEST())
+        self.before = G(TestJob, result=result)
+        self.before.data = get_file("then.json")
+        self.before.save()
+        self.after = G(TestJob, result=result)
+        self.after.data = get_file("now.json")
+        self.after.save()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_render_comparisons(self):
+        with self.settings(COMPARISON_CACHE_DIR=self.cache_dir):
+            outputs = render_comparisons([(self.before, self.after), (self.after, self.before)])
+
+        self.assertEqual(len(outputs), 2)
+        self.assertTrue("benchmark1" in outputs[0])
+
+    def test_reuses_cached_output(self):
+        with self.settings(COMPARISON_CACHE_DIR=self.cache_dir):
+            first = render_comparisons([(self.before, self.after)])
+            with patch('benchmarks.comparison.render_comparison') as render:
+                second = render_comparisons([(self.before, self.after)])
+
+        self.assertFalse(render.called)
+        self.assertEqual(first, second)
+
+    def test_unwritable_cache(self):
+        # a directory can't be created under a regular file, even by root
+        blocker = os.path.join(self.cache_dir, 'file')
+        open(blocker, 'w').close()
+        with self.settings(COMPARISON_CACHE_DIR=os.path.join(blocker, 'comparisons')):
+            outputs = render_comparisons([(self.before, self.after)])
+
+        self.assertTrue("benchmark1" in outputs[0])
+
+    def test_cache_key_depends_on_compare_script(self):
+        self.assertNotEqual(
+            comparison_key(self.before, self.after, 'rev1'),
+            comparison_key(self.before, self.after, 'rev2'),
+        )
+
+    def test_revision_depends_on_checkout(self):
+        with patch('benchmarks.comparison._checkout_revision', lambda d: 'commit1'):
+            first = compare_script_revision()
+        with patch('benchmarks.comparison._checkout_revision', lambda d: 'commit2'):
+            second = compare_script_revision()
+        self.assertNotEqual(first, second)
+
+    def test_revision_depends_on_arguments(self):
+        first = compare_script_revision()
+        with patch('benchmarks.comparison.compare_command', ['/bin/cat', '--output-for-linaro-automation']):
+            second = compare_script_revision()
+        self.assertNotEqual(first, second)
@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase
+
+from benchmarks import diskcache
+
+
+class DiskCacheTest(TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def entry(self, name, content='1234', age=0):
+        path = os.path.join(self.cache_dir, name[:2], name)
+        diskcache.write(path, content)
+        mtime = os.stat(path).st_mtime - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_round_trip(self):
+        path = self.entry('abc')
+        self.assertEqual('1234', diskcache.read(path))
+        self.assertIsNone(diskcache.read(path + 'x'))
+
+    def test_evicts_least_recently_used(self):
+        a = self.entry('aa', age=30)
+        b = self.entry('bb', age=20)
+        c = self.entry('cc', age=10)
+        # reading marks as recently used
+        diskcache.read(a)
+
+        self.assertEqual(1, diskcache.evict(self.cache_dir, 8))
+
+        self.assertTrue(os.path.exists(a))
+        self.assertFalse(os.path.exists(b))
+        self.assertTrue(os.path.exists(c))
+
+    def test_nothing_to_evict_under_budget(self):
+        self.entry('aa', age=30)
+        self.assertEqual(0, diskcache.evict(self.cache_dir, 4))
+
+    def test_leaves_files_being_written_alone(self):
+        os.makedirs(os.path.join(self.cache_dir, 'aa'))
+        tmp = os.path.join(self.cache_dir, 'aa', diskcache.TMP_PREFIX + 'x')
+        with open(tmp, 'w') as f:
+            f.write('12345678')
+
+        diskcache.evict(self.cache_dir, 0)
+
+        self.assertTrue(os.path.exists(tmp))
@@ -0,0 +1,128 @@
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django_dynamic_fixture import G
+from mock import patch
+
+from benchmarks import identity
+from benchmarks.models import Benchmark, BenchmarkGroup, Environment
+
+
+class ResolveTest(TestCase):
+
+    def setUp(self):
+        identity.clear()
+
+    def test_resolve_groups(self):
+        existing = G(BenchmarkGroup, name='foo/')
+        groups = identity.groups.resolve(['foo/', 'bar/'])
+
+        self.assertEqual(BenchmarkGroup.objects.count(), 2)
+        self.assertEqual(groups['foo/'], existing.id)
+        self.assertEqual(groups['bar/'], BenchmarkGroup.objects.get(name='bar/').id)
+
+    def test_resolve_benchmarks(self):
+        group = G(BenchmarkGroup, name='foo/')
+        existing = G(Benchmark, name='foo', group=group)
+        benchmarks = identity.benchmarks.resolve([('foo', group.id), ('foo', None)])
+
+        self.assertEqual(Benchmark.objects.count(), 2)
+        self.assertEqual(benchmarks[('foo', group.id)], existing.id)
+        self.assertEqual(benchmarks[('foo', None)], Benchmark.objects.get(name='foo', group=None).id)
+
+    def test_new_environment_gets_default_name(self):
+        identity.environments.get_id('myenv')
+        self.assertEqual(Environment.objects.get(identifier='myenv').name, 'myenv')
+
+    def test_no_create(self):
+        self.assertEqual(identity.environments.get_id('myenv', create=False), None)
+        self.assertEqual(Environment.objects.count(), 0)
+
+    def test_does_not_cache_inside_transaction(self):
+        identity.environments.get_id('myenv')
+        self.assertEqual(identity.environments.stats()['size'], 0)
+
+    def test_does_not_cache_rows_saved_inside_transaction(self):
+        G(Environment, identifier='myenv')
+        identity.environments.get_id('myenv')
+        self.assertEqual(identity.environments.stats()['size'], 0)
+
+
+class CachingTest(TransactionTestCase):
+
+    def setUp(self):
+        identity.clear()
+
+    def tearDown(self):
+        identity.clear()
+
+    def test_hit(self):
+        first = identity.environments.get_id('myenv')
+        hits = identity.environments.hits
+
+        # only the generation is checked
+        with self.assertNumQueries(1):
+            self.assertEqual(identity.environments.get_id('myenv'), first)
+        self.assertEqual(identity.environments.hits, hits + 1)
+
+    def test_caches_existing_rows_inside_transaction(self):
+        first = identity.environments.get_id('myenv')
+        identity.clear()
+
+        with transaction.atomic():
+            self.assertEqual(identity.environments.get_id('myenv'), first)
+            with self.assertNumQueries(1):
+                identity.environments.get_id('myenv')
+
+    def test_does_not_cache_rows_created_by_the_transaction(self):
+        with transaction.atomic():
+            identity.environments.get_id('myenv')
+            identity.environments.get_id('myenv')
+            self.assertEqual(identity.environments.stats()['size'], 0)
+
+    def test_invalidate_on_delete(self):
+        identity.environments.get_id('myenv')
+        Environment.objects.get(identifier='myenv').delete()
+
+        second = identity.environments.get_id('myenv')
+        self.assertEqual(Environment.objects.get(identifier='myenv').id, second)
+
+    def test_invalidate_on_rename(self):
+        pk = identity.groups.get_id('foo/')
+        group = BenchmarkGroup.objects.get(pk=pk)
+        group.name = 'bar/'
+        group.save()
+
+        self.assertNotEqual(identity.groups.get_id('foo/'), pk)
+
+    def test_invalidate_on_rename_by_other_process(self):
+        # update() sends no signals, like changes made by other processes
+        pk = identity.groups.get_id('foo/')
+        BenchmarkGroup.objects.filter(pk=pk).update(name='bar/')
+
+        self.assertNotEqual(identity.groups.get_id('foo/'), pk)
+
+    def test_invalidate_on_delete_by_other_process(self):
+        pk = identity.environments.get_id('myenv')
+        Environment.objects.filter(pk=pk)._raw_delete(Environment.objects.db)
+
+        self.assertNotEqual(identity.environments.get_id('myenv'), pk)
+
+    def test_other_changes_do_not_invalidate(self):
+        identity.environments.get_id('myenv')
+        Environment.objects.update(name='My environment')
+
+        self.assertEqual(identity.environments.stats()['size'], 1)
+        with self.assertNumQueries(1):
+            identity.environments.get_id('myenv')
+
+    @patch('django.conf.settings.IDENTITY_CACHE_SIZE', 2)
+    def test_bounded(self):
+        identity.groups.resolve(['a/', 'b/', 'c/'])
+        self.assertEqual(identity.groups.stats()['size'], 2)
+
+    @patch('django.conf.settings.IDENTITY_CACHE_TIMEOUT', -1)
+    def test_expiration(self):
+        identity.groups.get_id('a/')
+        misses = identity.groups.misses
+        identity.groups.get_id('a/')
+        self.assertEqual(identity.groups.misses, misses + 1)
@@ -0,0 +1,75 @@
+from django.test import TestCase
+from django_dynamic_fixture import G
+
+from benchmarks.models import Benchmark, BenchmarkGroup, BenchmarkGroupSummary
+from benchmarks.models import Result, ResultData, TestJob
+from benchmarks.ingestion import store_test_results
+
+from benchmarks.testing import MANIFEST
+
+
+TEST_RESULTS = [
+    {
+        'benchmark_group': 'benchmarks/group1/',
+        'benchmark_name': 'foo',
+        'subscore': [
+            { 'name': 'foo1', 'measurement': 1 },
+            { 'name': 'foo1', 'measurement': 3 },
+            { 'name': 'foo2', 'measurement': 4 },
+        ]
+    },
+    {
+        'benchmark_group': 'benchmarks/group2/',
+        'benchmark_name': 'foo',
+        'subscore': [
+            { 'name': 'foo1', 'measurement': 2 },
+        ]
+    },
+    {
+        'benchmark_name': 'bar',
+        'subscore': [
+            { 'name': 'bar1', 'measurement': 5 },
+        ]
+    },
+]
+
+
+class StoreTestResultsTest(TestCase):
+
+    def setUp(self):
+        result = G(Result, manifest=MANIFEST())
+        self.testjob = G(TestJob, id='1000', result=result)
+
+    def test_result_data(self):
+        count = store_test_results(self.testjob, TEST_RESULTS)
+
+        self.assertEqual(count, 4)
+        self.assertEqual(Benchmark.objects.count(), 3)
+
+        foo1 = ResultData.objects.get(name='foo1', benchmark__group__name='benchmarks/group1/')
+        self.assertEqual(foo1.values, [1, 3])
+        self.assertEqual(foo1.measurement, 2)
+        self.assertEqual(foo1.stdev, 1)
+        self.assertEqual(foo1.test_job_id, '1000')
+
+    def test_data_count(self):
+        store_test_results(self.testjob, TEST_RESULTS)
+        self.assertEqual(Result.objects.get(pk=self.testjob.result_id).data_count, 4)
+
+    def test_summaries(self):
+        store_test_results(self.testjob, TEST_RESULTS)
+
+        # group1 + group2 + root; 'bar' has no group
+        self.assertEqual(BenchmarkGroupSummary.objects.count(), 3)
+        root = BenchmarkGroupSummary.objects.get(group__name='/')
+        self.assertEqual(root.count, 4)
+        self.assertAlmostEqual(root.measurement, 24 ** 0.25)
+
+    def test_reuses_benchmarks(self):
+        store_test_results(self.testjob, TEST_RESULTS)
+        other = G(TestJob, id='1001', result=self.testjob.result)
+        store_test_results(other, TEST_RESULTS)
+
+        self.assertEqual(Benchmark.objects.count(), 3)
+        self.assertEqual(BenchmarkGroup.objects.count(), 3)
+        self.assertEqual(ResultData.objects.count(), 8)
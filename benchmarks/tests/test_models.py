@@ -2,6 +2,10 @@ import os
 from datetime import timedelta
 from dateutil.relativedelta import relativedelta
 
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.db.models.deletion import Collector
 from django.test import TestCase
 from django.utils import timezone
 from mock import patch
@@ -10,7 +14,7 @@ from django_dynamic_fixture import G
 
 from benchmarks.tests import get_file
 
-from benchmarks.models import Result, ResultData, TestJob, Manifest, Benchmark
+from benchmarks.models import Result, ResultData, TestJob, Manifest, Benchmark, Environment
 
 from benchmarks.testing import MANIFEST
 
@@ -46,6 +50,135 @@ class ResultTestCase(TestCase):
         testjob.completed = True
         self.assertEqual(result.completed, False)
 
+    def test_job_counters(self):
+        result = G(Result, manifest=MANIFEST())
+        testjob = G(TestJob, result=result, completed=False)
+        G(TestJob, result=result, completed=True)
+
+        testjob = TestJob.objects.get(pk=testjob.pk)
+        testjob.save()  # no state change
+        testjob.completed = True
+        testjob.save()
+
+        result = Result.objects.get(pk=result.pk)
+        self.assertEqual(result.total_jobs, 2)
+        self.assertEqual(result.completed_jobs, 2)
+        self.assertEqual(result.completed, True)
+
+    def test_job_counters_on_delete(self):
+        result = G(Result, manifest=MANIFEST())
+        G(TestJob, result=result, completed=True)
+        G(TestJob, result=result, completed=False).delete()
+
+        result = Result.objects.get(pk=result.pk)
+        self.assertEqual(result.total_jobs, 1)
+        self.assertEqual(result.completed, True)
+
+    def test_job_counters_with_deferred_fields(self):
+        result = G(Result, manifest=MANIFEST())
+        testjob = G(TestJob, result=result, completed=True)
+
+        TestJob.objects.only('id', 'result').get(pk=testjob.pk).save()
+        TestJob.objects.defer('completed').get(pk=testjob.pk).delete()
+
+        result = Result.objects.get(pk=result.pk)
+        self.assertEqual((result.total_jobs, result.completed_jobs), (0, 0))
+
+    def test_result_data_can_be_fast_deleted(self):
+        # the job counters receiver must not listen to deletes of other models
+        collector = Collector(using='default')
+        self.assertTrue(collector.can_fast_delete(ResultData.objects.all()))
+
+    def test_job_save_touches_result(self):
+        result = G(Result, manifest=MANIFEST())
+        testjob = G(TestJob, result=result, completed=False)
+        past = timezone.now() - relativedelta(days=1)
+        Result.objects.filter(pk=result.pk).update(updated_at=past)
+
+        testjob.status = 'Running'
+        testjob.save()
+
+        self.assertTrue(Result.objects.get(pk=result.pk).updated_at > past)
+
+    def test_save_does_not_overwrite_job_counters(self):
+        result = G(Result, manifest=MANIFEST())
+        stale = Result.objects.get(pk=result.pk)
+        G(TestJob, result=result, completed=True)
+
+        stale.annotation = 'foo'
+        stale.save()
+
+        self.assertEqual(Result.objects.get(pk=result.pk).completed_jobs, 1)
+
+    def test_rebuild_job_counters(self):
+        result = G(Result, manifest=MANIFEST())
+        G(TestJob, result=result, completed=True)
+        Result.objects.update(total_jobs=5, completed_jobs=0)
+
+        call_command('rebuild_job_counters', stdout=StringIO())
+
+        result = Result.objects.get(pk=result.pk)
+        self.assertEqual((result.total_jobs, result.completed_jobs), (1, 1))
+
+    def test_baseline_resolved_when_jobs_attached(self):
+        env = G(Environment)
+        baseline = G(Result, manifest=MANIFEST(), branch_name="master", gerrit_change_number=None)
+        G(TestJob, result=baseline, environment=env)
+        current = G(Result, manifest=MANIFEST(), branch_name="master", gerrit_change_number=123)
+        self.assertEqual(current.baseline_id, None)
+
+        G(TestJob, result=current, environment=env)
+
+        current = Result.objects.get(pk=current.pk)
+        self.assertEqual(current.baseline_id, baseline.id)
+        with self.assertNumQueries(1):
+            self.assertEqual(current.baseline, baseline)
+
+    def test_newer_baseline_build_replaces_baseline(self):
+        now = timezone.now()
+        env = G(Environment)
+        old = G(Result, manifest=MANIFEST(), branch_name="master", gerrit_change_number=None,
+                created_at=now - relativedelta(days=2))
+        G(TestJob, result=old, environment=env)
+        current = G(Result, manifest=MANIFEST(), branch_name="master", gerrit_change_number=123,
+                    created_at=now - relativedelta(days=1))
+        G(TestJob, result=current, environment=env)
+
+        new = G(Result, manifest=MANIFEST(), branch_name="master", gerrit_change_number=None, created_at=now)
+        G(TestJob, result=new, environment=G(Environment))
+        self.assertEqual(Result.objects.get(pk=current.pk).baseline_id, old.id)
+
+        G(TestJob, result=new, environment=env)
+        self.assertEqual(Result.objects.get(pk=current.pk).baseline_id, new.id)
+
+    def test_older_baseline_build_does_not_replace_baseline(self):
+        now = timezone.now()
+        env = G(Environment)
+        new = G(Result, manifest=MANIFEST(), branch_name="master", gerrit_change_number=None, created_at=now)
+        G(TestJob, result=new, environment=env)
+        current = G(Result, manifest=MANIFEST(), branch_name="master", gerrit_change_number=123)
+        G(TestJob, result=current, environment=env)
+
+        old = G(Result, manifest=MANIFEST(), branch_name="master", gerrit_change_number=None,
+                created_at=now - relativedelta(days=1))
+        G(TestJob, result=old, environment=env)
+
+        self.assertEqual(Result.objects.get(pk=current.pk).baseline_id, new.id)
+
+    def test_environment_set_later_resolves_baseline(self):
+        env = G(Environment)
+        baseline = G(Result, manifest=MANIFEST(), branch_name="master", gerrit_change_number=None)
+        G(TestJob, result=baseline, environment=env)
+        current = G(Result, manifest=MANIFEST(), branch_name="master", gerrit_change_number=123)
+        testjob = G(TestJob, result=current, environment=None)
+        self.assertEqual(Result.objects.get(pk=current.pk).baseline_id, None)
+
+        testjob = TestJob.objects.get(pk=testjob.pk)
+        testjob.environment = env
+        testjob.save()
+
+        self.assertEqual(Result.objects.get(pk=current.pk).baseline_id, baseline.id)
+
     def test_updated_at_on_creation(self):
         result = G(Result, manifest=MANIFEST())
         self.assertTrue(result.updated_at is not None)
@@ -186,6 +319,25 @@ class ResultTestCase(TestCase):
 
         self.assertEqual(previous_master, current_master.to_compare())
 
+    def test_to_compare_is_cached(self):
+        result = G(Result, manifest=MANIFEST(), branch_name="master", gerrit_change_number=123)
+        G(ResultData, result=result, benchmark__name="load", name="load-avg", measurement=10)
+
+        result = Result.objects.get(pk=result.pk)
+        self.assertEqual(result.data_count, 1)
+        with self.assertNumQueries(1):
+            result.to_compare()
+            result.to_compare()
+
+    def test_rebuild_data_count(self):
+        result = G(Result, manifest=MANIFEST())
+        G(ResultData, result=result, benchmark__name="load", name="load-avg", measurement=10)
+        Result.objects.update(data_count=5)
+
+        call_command('rebuild_job_counters', stdout=StringIO())
+
+        self.assertEqual(Result.objects.get(pk=result.pk).data_count, 1)
+
 class TestJobTestCase(TestCase):
 
     def test_metadata_is_empty_by_default(self):
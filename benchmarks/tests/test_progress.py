@@ -0,0 +1,68 @@
+from dateutil.relativedelta import relativedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from django_dynamic_fixture import G
+
+from benchmarks.models import Environment, Result, TestJob
+from benchmarks.progress import get_progress_since
+
+from benchmarks.testing import MANIFEST
+
+
+class GetProgressSinceTest(TestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.env1 = G(Environment, identifier='env1')
+        self.env2 = G(Environment, identifier='env2')
+
+    def __testjob__(self, days_ago, environment, name='myproject', branch='master', change=None):
+        created_at = self.now - relativedelta(days=days_ago)
+        result = G(Result, manifest=MANIFEST(), name=name, branch_name=branch,
+                   gerrit_change_number=change, created_at=created_at)
+        return G(TestJob, result=result, environment=environment, created_at=created_at)
+
+    def test_last_job_before_and_after(self):
+        self.__testjob__(10, self.env1)
+        before = self.__testjob__(8, self.env1)
+        self.__testjob__(3, self.env1)
+        after = self.__testjob__(2, self.env1)
+
+        progress = get_progress_since(self.now - relativedelta(days=7))
+
+        self.assertEqual(len(progress), 1)
+        self.assertEqual(progress[0].project, 'myproject')
+        self.assertEqual(progress[0].branch, 'master')
+        self.assertEqual(progress[0].environment, self.env1)
+        self.assertEqual(progress[0].before, before)
+        self.assertEqual(progress[0].after, after)
+
+    def test_per_project_branch_and_environment(self):
+        for env in (self.env1, self.env2):
+            for branch in ('master', 'stable'):
+                self.__testjob__(8, env, branch=branch)
+                self.__testjob__(2, env, branch=branch)
+        self.__testjob__(2, self.env1, name='other')  # nothing before
+
+        progress = get_progress_since(self.now - relativedelta(days=7))
+
+        self.assertEqual(
+            [(p.branch, p.environment.identifier) for p in progress],
+            [('master', 'env1'), ('master', 'env2'), ('stable', 'env1'), ('stable', 'env2')],
+        )
+
+    def test_ignores_gerrit_changes(self):
+        self.__testjob__(8, self.env1)
+        self.__testjob__(2, self.env1, change=123)
+
+        self.assertEqual(get_progress_since(self.now - relativedelta(days=7)), [])
+
+    def test_number_of_queries(self):
+        for days_ago in (8, 2):
+            for env in (self.env1, self.env2):
+                self.__testjob__(days_ago, env)
+
+        with self.assertNumQueries(2):
+            progress = get_progress_since(self.now - relativedelta(days=7))
+            [p.before.result.name for p in progress]
@@ -0,0 +1,99 @@
+from datetime import datetime
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from django_dynamic_fixture import G
+
+from benchmarks import rollups
+from benchmarks.ingestion import store_test_results
+from benchmarks.models import Environment, Result, TestJob, Rollup
+from benchmarks.models import ResultDataRollup, BenchmarkGroupSummaryRollup
+
+from benchmarks.testing import MANIFEST
+
+
+def test_results(measurement):
+    return [
+        {
+            'benchmark_group': 'benchmarks/group1/',
+            'benchmark_name': 'foo',
+            'subscore': [
+                { 'name': 'foo1', 'measurement': measurement },
+            ]
+        },
+    ]
+
+
+class RollupsTest(TestCase):
+
+    def setUp(self):
+        self.environment = G(Environment)
+
+    def store(self, date, measurement, change=None):
+        result = G(Result, manifest=MANIFEST(), branch_name='master',
+                   gerrit_change_number=change, created_at=date)
+        testjob = G(TestJob, result=result, environment=self.environment, created_at=date)
+        store_test_results(testjob, test_results(measurement))
+
+    def test_period_start(self):
+        date = datetime(2016, 6, 2, 15, 30, tzinfo=timezone.utc)  # Thursday
+        self.assertEqual(rollups.period_start(date, Rollup.DAY), datetime(2016, 6, 2, tzinfo=timezone.utc))
+        self.assertEqual(rollups.period_start(date, Rollup.WEEK), datetime(2016, 5, 30, tzinfo=timezone.utc))
+
+    def test_update(self):
+        self.store(datetime(2016, 6, 2, 10, tzinfo=timezone.utc), 2)
+        self.store(datetime(2016, 6, 2, 20, tzinfo=timezone.utc), 8)
+        self.store(datetime(2016, 6, 3, 10, tzinfo=timezone.utc), 1)
+
+        daily = ResultDataRollup.objects.filter(period=Rollup.DAY).order_by('start')
+        self.assertEqual([r.count for r in daily], [2, 1])
+        self.assertEqual((daily[0].minimum, daily[0].maximum, daily[0].mean), (2, 8, 5))
+        self.assertAlmostEqual(daily[0].stdev, 3)
+        self.assertAlmostEqual(daily[0].geomean, 4)
+
+        weekly = ResultDataRollup.objects.get(period=Rollup.WEEK)
+        self.assertEqual(weekly.count, 3)
+
+        # group1 and root
+        summaries = BenchmarkGroupSummaryRollup.objects.filter(period=Rollup.WEEK)
+        self.assertEqual(summaries.count(), 2)
+        self.assertAlmostEqual(summaries[0].geomean, 16 ** (1.0 / 3))
+
+    def test_only_baseline_builds(self):
+        self.store(timezone.now(), 2, change=123)
+        self.assertEqual(ResultDataRollup.objects.count(), 0)
+
+    def test_rebuild(self):
+        self.store(datetime(2016, 6, 2, 10, tzinfo=timezone.utc), 2)
+        self.store(datetime(2016, 6, 3, 10, tzinfo=timezone.utc), 8)
+        fields = ('period', 'start', 'name', 'count', 'total', 'minimum', 'maximum', 'log_count')
+        incremental = sorted(ResultDataRollup.objects.values_list(*fields))
+        summaries = sorted(BenchmarkGroupSummaryRollup.objects.values_list('period', 'start', 'count', 'log_count'))
+
+        call_command('rebuild_rollups', stdout=StringIO())
+
+        self.assertEqual(sorted(ResultDataRollup.objects.values_list(*fields)), incremental)
+        self.assertEqual(sorted(BenchmarkGroupSummaryRollup.objects.values_list('period', 'start', 'count', 'log_count')), summaries)
+
+    def test_rebuild_skips_non_positive_logarithms(self):
+        self.store(datetime(2016, 6, 2, 10, tzinfo=timezone.utc), 0)
+        self.store(datetime(2016, 6, 2, 11, tzinfo=timezone.utc), 4)
+
+        call_command('rebuild_rollups', stdout=StringIO())
+
+        daily = ResultDataRollup.objects.get(period=Rollup.DAY)
+        self.assertEqual((daily.count, daily.log_count), (2, 1))
+        self.assertAlmostEqual(daily.geomean, 4)
+
+    def test_choose_period(self):
+        for day in (1, 2, 3):
+            for hour in (10, 20):
+                self.store(datetime(2016, 6, day, hour, tzinfo=timezone.utc), day)
+        queryset = ResultDataRollup.objects.all()
+        series = ('benchmark_id', 'name')
+
+        self.assertEqual(rollups.choose_period(queryset, series, 6), None)
+        self.assertEqual(rollups.choose_period(queryset, series, 3), Rollup.DAY)
+        self.assertEqual(rollups.choose_period(queryset, series, 2), Rollup.WEEK)
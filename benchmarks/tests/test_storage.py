@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+
+from StringIO import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django_dynamic_fixture import G
+
+from benchmarks.models import TestJob
+from benchmarks.storage import ContentAddressedStorage, local_copy
+from benchmarks.testing import MANIFEST
+
+
+class ContentAddressedStorageTest(TestCase):
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.location, compress=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.location)
+
+    def test_round_trip(self):
+        name = self.storage.save('foo.json', ContentFile('{"a": 1}' * 100))
+
+        self.assertTrue(name.startswith('blobs/'))
+        self.assertTrue(name.endswith('.json'))
+        self.assertEqual(self.storage.open(name).read(), '{"a": 1}' * 100)
+        self.assertEqual(self.storage.size(name), 800)
+        self.assertTrue(self.storage.disk_size(name) < 800)
+
+    def test_dedupe(self):
+        first = self.storage.save('foo.json', ContentFile('data'))
+        second = self.storage.save('bar.json', ContentFile('data'))
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.storage.content_hash(first), os.path.basename(first)[:-5])
+
+    def test_uncompressed(self):
+        storage = ContentAddressedStorage(location=self.location, compress=False)
+        name = storage.save('foo.json', ContentFile('data'))
+
+        with open(storage.path(name)) as f:
+            self.assertEqual(f.read(), 'data')
+
+    def test_compressed_has_no_path(self):
+        name = self.storage.save('foo.json', ContentFile('data'))
+        with self.assertRaises(NotImplementedError):
+            self.storage.path(name)
+
+    def test_reads_files_stored_before(self):
+        with open(os.path.join(self.location, 'old.json'), 'w') as f:
+            f.write('data')
+
+        self.assertEqual(self.storage.open('old.json').read(), 'data')
+        self.assertEqual(self.storage.size('old.json'), 4)
+        self.assertEqual(self.storage.content_hash('old.json'), None)
+
+    def test_local_copy(self):
+        testjob = G(TestJob, id='1', result__manifest=MANIFEST())
+        testjob.data.save('foo.json', ContentFile('data'))
+
+        with local_copy(testjob.data) as path:
+            with open(path) as f:
+                self.assertEqual(f.read(), 'data')
+
+    def test_usage(self):
+        name = self.storage.save('foo.json', ContentFile('x' * 1000))
+
+        logical, physical = self.storage.usage([name, name])
+
+        self.assertEqual(logical, 2000)
+        self.assertEqual(physical, self.storage.disk_size(name))
+
+
+class TestJobDataUsageTest(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.media_settings.enable()
+
+    def tearDown(self):
+        self.media_settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_convert(self):
+        storage = TestJob._meta.get_field('data').storage
+        for i in range(2):
+            with open(storage.path('old%d.json' % i), 'w') as f:
+                f.write('same data')
+            G(TestJob, id=str(i), data='old%d.json' % i, result__manifest=MANIFEST())
+
+        out = StringIO()
+        call_command('testjob_data_usage', convert=True, stdout=out)
+
+        names = set(TestJob.objects.values_list('data', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertTrue(names.pop().startswith('blobs/'))
+        self.assertIn('2 files converted', out.getvalue())
+        self.assertEqual(TestJob.objects.get(id='0').data.read(), 'same data')
@@ -2,12 +2,17 @@ from django.test import TestCase
 from django_dynamic_fixture import G, N
 from mock import patch
 from django.core import mail
+from datetime import timedelta
 from dateutil.relativedelta import relativedelta
 from django.utils import timezone
 import re
 
 import django.core.mail
+import psycopg2
+from django.db import connection
 
+from benchmarks import ingestion
+from benchmarks import locks
 from benchmarks.models import Benchmark
 from benchmarks.models import BenchmarkGroup
 from benchmarks.models import Environment
@@ -15,11 +20,14 @@ from benchmarks.models import Result
 from benchmarks.models import ResultData
 from benchmarks.models import TestJob
 from benchmarks.testminer import LavaServerException
+from benchmarks.testminer import LavaResponseException
 
 from benchmarks.tasks import set_testjob_results
 from benchmarks.tasks import report_email
 from benchmarks.tasks import report_gerrit
 from benchmarks.tasks import store_testjob_data
+from benchmarks.tasks import check_testjob_completeness
+from benchmarks.tasks import poll_delay
 
 from benchmarks.progress import Progress
 from benchmarks.tasks import daily_benchmark_progress
@@ -113,6 +121,221 @@ class LavaFetchTest(TestCase):
 
         self.assertEqual(2, result.data.count())
 
+    @patch("benchmarks.tasks.get_testjob_data", populate_successful_job)
+    def test_counts_skipped_duplicate_results(self):
+        result = G(Result, manifest=MANIFEST())
+        testjob = G(TestJob, result=result, status='Submitted')
+
+        set_testjob_results.apply(args=[testjob.id])
+        skipped = ingestion.duplicates.stats()
+        set_testjob_results.apply(args=[testjob.id])
+
+        self.assertEqual(
+            ingestion.fingerprint(populate_successful_job(testjob)),
+            TestJob.objects.get(pk=testjob.id).results_fingerprint,
+        )
+        self.assertEqual(ingestion.duplicates.artifacts, skipped['artifacts'] + 1)
+        self.assertEqual(ingestion.duplicates.rows, skipped['rows'] + 2)
+
+    def test_does_not_fetch_loaded_results_again(self):
+        result = G(Result, manifest=MANIFEST())
+        testjob = G(TestJob, result=result, status='Submitted')
+
+        with patch("benchmarks.tasks.get_testjob_data", side_effect=populate_successful_job) as get_testjob_data:
+            set_testjob_results.apply(args=[testjob.id])
+            set_testjob_results.apply(args=[testjob.id])
+
+        self.assertEqual(1, get_testjob_data.call_count)
+
+
+def lava_job_statuses(self, calls, return_errors=False):
+    statuses = {'1': 'Running', '2': 'Complete', '3': 'Submitted'}
+    return [{'job_status': statuses[args[0]]} if args[0] in statuses else LavaResponseException("Job not found")
+            for _, args in calls]
+
+
+class CheckTestJobCompletenessTest(TestCase):
+
+    def setUp(self):
+        self.result = G(Result, manifest=MANIFEST())
+
+    def incomplete_testjob(self, id, status='Submitted', testrunnerclass='GenericLavaTestSystem', url='https://validation.example.com/RPC2/'):
+        return G(TestJob, id=id, result=self.result, status=status, completed=False,
+                 testrunnerclass=testrunnerclass, testrunnerurl=url)
+
+    @patch.dict('django.conf.settings.CREDENTIALS', {'validation.example.com': ('user', 'key')})
+    @patch('benchmarks.testminer.GenericLavaTestSystem.multicall', lava_job_statuses)
+    @patch('benchmarks.tasks.set_testjob_results.apply_async')
+    def test_only_fetches_finished_jobs(self, apply_async):
+        self.incomplete_testjob('1', status='Submitted')
+        self.incomplete_testjob('2', status='Running')
+        self.incomplete_testjob('3', status='Submitted')
+        self.incomplete_testjob('4')
+
+        check_testjob_completeness.apply()
+
+        # 2 is complete, 4 could not be polled
+        fetched = sorted(call[1]['args'][0] for call in apply_async.call_args_list)
+        self.assertEqual(['2', '4'], fetched)
+        self.assertEqual('Running', TestJob.objects.get(id='1').status)
+        self.assertEqual('Submitted', TestJob.objects.get(id='3').status)
+
+    @patch.dict('django.conf.settings.CREDENTIALS', {'validation.example.com': ('user', 'key')})
+    @patch('django.conf.settings.LAVA_MULTICALL_SIZE', 2)
+    @patch('benchmarks.testminer.GenericLavaTestSystem.multicall', autospec=True, side_effect=lava_job_statuses)
+    @patch('benchmarks.tasks.set_testjob_results.apply_async')
+    def test_batches_calls_per_server(self, apply_async, multicall):
+        self.incomplete_testjob('1')
+        self.incomplete_testjob('2')
+        self.incomplete_testjob('3')
+        self.incomplete_testjob('1000', url='https://other.example.com/RPC2/')
+
+        check_testjob_completeness.apply()
+
+        # two batches for validation.example.com, none for other.example.com,
+        # which has no credentials, so its job is fetched as before
+        self.assertEqual(2, multicall.call_count)
+        fetched = sorted(call[1]['args'][0] for call in apply_async.call_args_list)
+        self.assertEqual(['1000', '2'], fetched)
+
+    @patch('benchmarks.tasks.set_testjob_results.apply_async')
+    def test_fetches_jobs_from_other_test_systems(self, apply_async):
+        self.incomplete_testjob('42', testrunnerclass='ArtJenkinsTestResults', url='https://ci.example.com/')
+
+        check_testjob_completeness.apply()
+
+        apply_async.assert_called_once_with(args=['42'])
+
+    @patch.dict('django.conf.settings.CREDENTIALS', {'validation.example.com': ('user', 'key')})
+    @patch('benchmarks.testminer.GenericLavaTestSystem.multicall', lava_job_statuses)
+    @patch('benchmarks.tasks.set_testjob_results.apply_async')
+    def test_skips_jobs_not_due(self, apply_async):
+        testjob = self.incomplete_testjob('2', status='Running')
+        TestJob.objects.filter(pk=testjob.pk).update(next_poll_at=timezone.now() + relativedelta(hours=1))
+
+        check_testjob_completeness.apply()
+
+        self.assertFalse(apply_async.called)
+
+    @patch.dict('django.conf.settings.CREDENTIALS', {'validation.example.com': ('user', 'key')})
+    @patch('benchmarks.testminer.GenericLavaTestSystem.multicall', lava_job_statuses)
+    @patch('benchmarks.tasks.set_testjob_results.apply_async')
+    def test_backs_off_while_status_does_not_change(self, apply_async):
+        self.incomplete_testjob('1', status='Running')
+        self.incomplete_testjob('3', status='Running')
+        TestJob.objects.update(poll_attempts=2)
+
+        before = timezone.now()
+        check_testjob_completeness.apply()
+
+        unchanged = TestJob.objects.get(id='1')
+        self.assertEqual(3, unchanged.poll_attempts)
+        self.assertTrue(unchanged.next_poll_at > before)
+
+        # status went from Running to Submitted: start over
+        changed = TestJob.objects.get(id='3')
+        self.assertEqual(0, changed.poll_attempts)
+        self.assertTrue(changed.next_poll_at < unchanged.next_poll_at)
+
+    @patch.dict('django.conf.settings.CREDENTIALS', {'validation.example.com': ('user', 'key')})
+    @patch('benchmarks.testminer.GenericLavaTestSystem.multicall', lava_job_statuses)
+    @patch('benchmarks.tasks.set_testjob_results.apply_async')
+    def test_abandons_jobs_past_the_horizon(self, apply_async):
+        self.incomplete_testjob('1', status='Running')
+        self.incomplete_testjob('2', status='Running')
+        self.incomplete_testjob('4', status='Running')
+        self.incomplete_testjob('42', testrunnerclass='ArtJenkinsTestResults', url='https://ci.example.com/')
+        TestJob.objects.update(created_at=timezone.now() - relativedelta(days=30))
+
+        check_testjob_completeness.apply()
+
+        abandoned = TestJob.objects.get(id='1')
+        self.assertEqual('Abandoned', abandoned.status)
+        self.assertTrue(abandoned.completed)
+        self.assertEqual(1, Result.objects.get(pk=self.result.pk).completed_jobs)
+        # finished jobs are still fetched, and so are the ones whose status
+        # is not known: 4 could not be polled, 42 is not run by LAVA
+        fetched = sorted(call[1]['args'][0] for call in apply_async.call_args_list)
+        self.assertEqual(['2', '4', '42'], fetched)
+        self.assertFalse(TestJob.objects.get(id='4').completed)
+        self.assertFalse(TestJob.objects.get(id='42').completed)
+
+
+class PollDelayTest(TestCase):
+
+    @patch('django.conf.settings.TESTJOB_POLL_JITTER', 0)
+    def test_exponential_backoff(self):
+        self.assertEqual(600, poll_delay('Running', timedelta(minutes=5), 0).total_seconds())
+        self.assertEqual(2400, poll_delay('Running', timedelta(minutes=5), 2).total_seconds())
+        self.assertEqual(1800, poll_delay('Submitted', timedelta(minutes=5), 0).total_seconds())
+
+    @patch('django.conf.settings.TESTJOB_POLL_JITTER', 0)
+    def test_old_jobs_are_polled_less_often(self):
+        self.assertEqual(3600, poll_delay('Running', timedelta(hours=10), 0).total_seconds())
+
+    @patch('django.conf.settings.TESTJOB_POLL_JITTER', 0)
+    def test_maximum_interval(self):
+        self.assertEqual(6 * 60 * 60, poll_delay('Running', timedelta(minutes=5), 100).total_seconds())
+
+    def test_jitter(self):
+        delays = set(poll_delay('Running', timedelta(minutes=5), 0).total_seconds() for _ in range(10))
+        self.assertTrue(len(delays) > 1)
+        self.assertTrue(all(480 <= d <= 720 for d in delays))
+
+
+class lock_from_another_session(object):
+
+    def __init__(self, testjob_id):
+        self.key = [locks.TESTJOB_LOCK_CLASS, locks.lock_key(testjob_id)]
+
+    def __enter__(self):
+        self.connection = psycopg2.connect(**connection.get_connection_params())
+        self.connection.autocommit = True
+        self.cursor = self.connection.cursor()
+        self.cursor.execute("SELECT pg_try_advisory_lock(%s, %s)", self.key)
+        return self.cursor.fetchone()[0]
+
+    def __exit__(self, *args):
+        self.connection.close()
+
+
+class TestJobLockTest(TestCase):
+
+    @patch("benchmarks.tasks.get_testjob_data")
+    def test_skips_job_being_fetched(self, get_testjob_data):
+        testjob = G(TestJob, id='1234', result=G(Result, manifest=MANIFEST()))
+        skipped = locks.skipped.count
+
+        with lock_from_another_session(testjob.id) as locked:
+            self.assertTrue(locked)
+            set_testjob_results.apply(args=[testjob.id])
+
+        self.assertFalse(get_testjob_data.called)
+        self.assertEqual(skipped + 1, locks.skipped.count)
+
+    @patch("benchmarks.tasks.get_testjob_data", set_status("Running"))
+    def test_releases_lock(self):
+        testjob = G(TestJob, id='1234', result=G(Result, manifest=MANIFEST()))
+
+        set_testjob_results.apply(args=[testjob.id])
+
+        with lock_from_another_session(testjob.id) as locked:
+            self.assertTrue(locked)
+
+    @patch("benchmarks.tasks.get_testjob_data", lava_xmlrpc_503)
+    def test_releases_lock_on_errors(self):
+        testjob = G(TestJob, id='1234', result=G(Result, manifest=MANIFEST()))
+
+        set_testjob_results.apply(args=[testjob.id])
+
+        with lock_from_another_session(testjob.id) as locked:
+            self.assertTrue(locked)
+
+    def test_lock_keys_are_32_bit_signed_integers(self):
+        for testjob_id in ['1', '1234.0', 'J1234_abc', u'\xe7']:
+            key = locks.lock_key(testjob_id)
+            self.assertTrue(-2 ** 31 <= key < 2 ** 31)
+
 
 class FakeGerrit(object):
     def __init__(self):
@@ -200,6 +423,20 @@ class StoreTestJobData(TestCase):
         self.assertEqual(result_data.values, [1,2])
         self.assertEqual(result_data.benchmark.name, 'bar')
 
+    def test_keeps_poll_schedule(self):
+        result = G(Result, manifest=MANIFEST())
+        testjob = G(TestJob, result=result, status='Complete', completed=True)
+        next_poll_at = timezone.now() + relativedelta(hours=1)
+        # rescheduled while the results were being fetched
+        TestJob.objects.filter(pk=testjob.pk).update(next_poll_at=next_poll_at, poll_attempts=3)
+
+        store_testjob_data(testjob, [])
+
+        testjob = TestJob.objects.get(pk=testjob.pk)
+        self.assertEqual(next_poll_at, testjob.next_poll_at)
+        self.assertEqual(3, testjob.poll_attempts)
+        self.assertTrue(testjob.completed)
+
     def test_result_data_with_benchmark_group(self):
         result = G(Result, manifest=MANIFEST())
         testjob = N(TestJob, result=result, status='Complete')
@@ -2,11 +2,15 @@ from django.test import TestCase
 from mock import patch
 import re
 import requests
+import shutil
+import tempfile
+import xmlrpclib
 
 from benchmarks.testminer import GenericLavaTestSystem
 from benchmarks.testminer import LavaServerException
 from benchmarks.testminer import LavaResponseException
 from benchmarks.testminer import ArtMicrobenchmarksTestResults
+from benchmarks.testminer import lava_session
 
 class MockResponse(object):
 
@@ -23,12 +27,130 @@ class MockResponse(object):
 class GenericLavaTestSystemTest(TestCase):
 
 
-    @patch("requests.request", MockResponse.http_error(500))
+    @patch("requests.Session.post", MockResponse.http_error(500))
     def test_lava_server_request_handling(self):
         tester = GenericLavaTestSystem('http://example.com/')
         with self.assertRaises(LavaServerException):
             tester.get_test_job_status(9999)
 
+    def test_session_per_server(self):
+        self.assertIs(lava_session('http://example.com/RPC2/'), lava_session('http://example.com/RPC2/'))
+        self.assertIsNot(lava_session('http://example.com/RPC2/'), lava_session('http://example.org/RPC2/'))
+
+
+class XMLRPCServer(object):
+    """
+    Answers XML-RPC requests made through requests.Session.post, including
+    system.multicall, from a dictionary of method name -> function.
+    """
+
+    def __init__(self, methods):
+        self.methods = methods
+        self.requests = []
+
+    def call(self, method_name, params):
+        if method_name not in self.methods:
+            raise xmlrpclib.Fault(1, 'no such method: %s' % method_name)
+        return self.methods[method_name](*params)
+
+    def __call__(self, url, data=None, **kwargs):
+        params, method_name = xmlrpclib.loads(data)
+        self.requests.append(method_name)
+        try:
+            if method_name == 'system.multicall' and 'system.multicall' not in self.methods:
+                result = []
+                for call in params[0]:
+                    try:
+                        result.append([self.call(call['methodName'], call['params'])])
+                    except xmlrpclib.Fault as fault:
+                        result.append({'faultCode': fault.faultCode, 'faultString': fault.faultString})
+            else:
+                result = self.call(method_name, params)
+            content = xmlrpclib.dumps((result,), methodresponse=True)
+        except xmlrpclib.Fault as fault:
+            content = xmlrpclib.dumps(fault)
+        return MockResponse(200, content)
+
+
+class LavaXMLRPCTest(TestCase):
+
+    def setUp(self):
+        self.server = XMLRPCServer({
+            'scheduler.job_status': lambda job_id: {'job_status': 'Complete', 'bundle_sha1': 'abc'},
+            'scheduler.job_details': lambda job_id: {'id': job_id},
+        })
+        self.patch = patch('requests.Session.post', self.server)
+        self.patch.start()
+        self.tester = GenericLavaTestSystem('http://example.com/')
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_memoization(self):
+        self.tester.get_test_job_status('1')
+        self.tester.get_test_job_status('1')
+        self.tester.get_test_job_status('2')
+        self.assertEqual(self.server.requests, ['scheduler.job_status'] * 2)
+
+    def test_resubmit_is_not_memoized(self):
+        self.server.methods['scheduler.resubmit_job'] = lambda job_id: '2'
+        self.tester.call_xmlrpc('scheduler.resubmit_job', '1')
+        self.tester.call_xmlrpc('scheduler.resubmit_job', '1')
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_multicall(self):
+        status, details = self.tester.multicall([
+            ('scheduler.job_status', ('1',)),
+            ('scheduler.job_details', ('1',)),
+        ])
+        self.assertEqual(status['job_status'], 'Complete')
+        self.assertEqual(details['id'], '1')
+        self.assertEqual(self.server.requests, ['system.multicall'])
+
+        # both memoized
+        self.tester.multicall([
+            ('scheduler.job_details', ('1',)),
+            ('scheduler.job_status', ('1',)),
+        ])
+        self.tester.get_test_job_status('1')
+        self.assertEqual(self.server.requests, ['system.multicall'])
+
+    def test_multicall_errors(self):
+        calls = [('scheduler.job_status', ('1',)), ('foo', ('1',))]
+        with self.assertRaises(LavaResponseException):
+            self.tester.multicall(calls)
+        status, error = self.tester.multicall(calls, return_errors=True)
+        self.assertEqual(status['job_status'], 'Complete')
+        self.assertTrue(isinstance(error, LavaResponseException))
+
+    def test_multicall_not_supported(self):
+        self.server.methods['system.multicall'] = lambda calls: self.server.call('nope', [])
+        status, details = self.tester.multicall([
+            ('scheduler.job_status', ('1',)),
+            ('scheduler.job_details', ('1',)),
+        ])
+        self.assertEqual(details['id'], '1')
+        self.assertEqual(self.server.requests, ['system.multicall', 'scheduler.job_status', 'scheduler.job_details'])
+
+    def test_bundles_are_cached(self):
+        self.server.methods['dashboard.get'] = lambda sha1: {'content': '{"test_runs": []}'}
+        cache_dir = tempfile.mkdtemp()
+        try:
+            with patch('django.conf.settings.BUNDLE_CACHE_DIR', cache_dir):
+                self.assertEqual({'test_runs': []}, self.tester.get_bundle('abc'))
+                other = GenericLavaTestSystem('http://example.com/')
+                self.assertEqual({'test_runs': []}, other.get_bundle('abc'))
+        finally:
+            shutil.rmtree(cache_dir)
+        self.assertEqual(self.server.requests, ['dashboard.get'])
+
+    def test_reuse_responses(self):
+        self.tester.get_test_job_status('1')
+        other = ArtMicrobenchmarksTestResults('http://example.com/')
+        other.reuse_responses(self.tester)
+        other.get_test_job_status('1')
+        self.assertEqual(self.server.requests, ['scheduler.job_status'])
+
 
 class LavaServerExceptionTest(TestCase):
 
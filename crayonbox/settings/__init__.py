@@ -76,7 +76,7 @@ DATETIME_FORMAT = "%d-%m-%Y %H:%M:%S"
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'api.renderers.JSONRenderer',
     ),
     'DEFAULT_FILTER_BACKENDS': (
         'rest_framework.filters.DjangoFilterBackend',
@@ -135,6 +135,60 @@ CREDENTIALS = {
 
 UPDATE_JENKINS = False
 
+# name -> id caches for Benchmark, BenchmarkGroup and Environment, kept by
+# each process (see benchmarks.identity). TIMEOUT is in seconds.
+IDENTITY_CACHE_SIZE = 10000
+IDENTITY_CACHE_TIMEOUT = 600
+
+# outputs of the compare script, keyed by the hashes of the data files and of
+# the script, its checkout and arguments (see benchmarks.comparison). Set to
+# None to disable.
+COMPARISON_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'comparisons')
+# size in bytes above which the least recently used comparisons are removed
+# from the cache (checked periodically by prune_disk_caches)
+COMPARISON_CACHE_SIZE = 512 * 1024 * 1024
+# maximum number of compare script processes run at once
+COMPARISON_WORKERS = 4
+
+# LAVA dashboard bundles, keyed by their SHA1 (see benchmarks.bundles), and
+# the size in bytes above which the least recently used ones are removed
+# (checked periodically by prune_disk_caches). Set the directory to None to
+# disable.
+BUNDLE_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'bundles')
+BUNDLE_CACHE_SIZE = 2 * 1024 * 1024 * 1024
+
+# number of items encoded at a time by api.renderers.StreamingJSONResponse
+JSON_STREAM_CHUNK_SIZE = 500
+
+# TestJob.data files are stored once per distinct content (see
+# benchmarks.storage); COMPRESS gzips them on disk
+DEFAULT_FILE_STORAGE = 'benchmarks.storage.ContentAddressedStorage'
+TESTJOB_DATA_COMPRESS = True
+
+# number of job statuses fetched per system.multicall request when polling
+# LAVA servers for incomplete test jobs
+LAVA_MULTICALL_SIZE = 100
+
+# polling schedule of incomplete test jobs, in seconds. The interval for a
+# status doubles each time a job is polled without changing status, up to
+# MAX_INTERVAL, and is varied randomly by up to JITTER (a fraction) so that
+# jobs submitted together are not polled together. Jobs still not finished
+# HORIZON seconds after being submitted are abandoned.
+TESTJOB_POLL_INTERVALS = {
+    'Submitted': 30 * 60,
+    'Running': 10 * 60,
+}
+TESTJOB_POLL_INTERVAL = 10 * 60
+TESTJOB_POLL_MAX_INTERVAL = 6 * 60 * 60
+TESTJOB_POLL_JITTER = 0.2
+TESTJOB_POLL_HORIZON = 14 * 24 * 60 * 60
+
+# let the web server send test job data files: None (Django streams them),
+# 'X-Sendfile' (Apache, lighttpd) or 'X-Accel-Redirect' (nginx). For nginx,
+# the prefix is an internal location that maps to the media directory.
+DOWNLOAD_SENDFILE_HEADER = None
+DOWNLOAD_ACCEL_REDIRECT_PREFIX = '/protected/'
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.8/topics/i18n/
 LANGUAGE_CODE = 'en-us'
@@ -171,6 +225,10 @@ CELERYBEAT_SCHEDULE = {
         'task': 'benchmarks.tasks.check_testjob_completeness',
         'schedule': crontab(minute='*/10'),
     },
+    'Prune disk caches': {
+        'task': 'benchmarks.tasks.prune_disk_caches',
+        'schedule': crontab(minute=30),
+    },
     'Check for copleted Build': {
         'task': 'benchmarks.tasks.check_result_completeness',
         'schedule': crontab(minute='*/10'),
@@ -1,3 +1,5 @@
+import tempfile
+
 try:
     from crayonbox.settings.private import *
 except ImportError:
@@ -5,6 +7,10 @@ except ImportError:
 
 SECRET_KEY = '0Z$wOPv'
 
+COMPARISON_CACHE_DIR = tempfile.mkdtemp(prefix='art-reports-comparisons-')
+MEDIA_ROOT = tempfile.mkdtemp(prefix='art-reports-media-')
+BUNDLE_CACHE_DIR = tempfile.mkdtemp(prefix='art-reports-bundles-')
+
 AUTH_CROWD_ALWAYS_UPDATE_USER = False
 AUTH_CROWD_ALWAYS_UPDATE_GROUPS = False
 AUTH_CROWD_APPLICATION_USER = "test"
@@ -414,7 +414,8 @@ app.controller('Stats', ['$scope', '$http', '$routeParams', '$timeout', '$q', '$
                     environment: $scope.get_environment_ids(),
                     startDate: $scope.startDate && $scope.startDate.getTime() / 1000,
                     endDate: $scope.endDate && $scope.endDate.getTime() / 1000,
-                    limit: $scope.limit
+                    limit: $scope.limit,
+                    max_points: 500
                 };
 
                 if (params.environment.length > 0) {
@@ -456,7 +457,7 @@ app.controller('Stats', ['$scope', '$http', '$routeParams', '$timeout', '$q', '$
                     }
                 }
                 else {
-                    stats_endpoint = '/api/stats/';
+                    stats_endpoint = '/api/stats/series/';
                     params.benchmark = benchmark.name;
                 }
 
@@ -528,6 +529,36 @@ app.controller('Stats', ['$scope', '$http', '$routeParams', '$timeout', '$q', '$
         $scope.updateCharts();
     }
 
+    /* chart points by name, from either one object per point or the column
+     * arrays returned by /api/stats/series/
+     */
+    var chartPoints = function(data) {
+        if (data.length > 0 && data[0].timestamp != undefined) {
+            return _.fromPairs(_.map(data, function(columns) {
+                return [columns.name, _.map(columns.timestamp, function(x, j) {
+                    return {
+                        x: x,
+                        y: columns.measurement[j],
+                        min: columns.min[j],
+                        max: columns.max[j],
+                        result_id: columns.result[j]
+                    };
+                })];
+            }));
+        }
+        return _.mapValues(_.groupBy(data, "name"), function(points) {
+            return _.map(points, function(point) {
+                return {
+                    x: Date.parse(point.created_at),
+                    y: point.measurement,
+                    min: _.min(point.values),
+                    max: _.max(point.values),
+                    result_id: point.result
+                };
+            });
+        });
+    };
+
     $scope.drawChart = function(benchmark, branch, env_data, annotations, element) {
         var series = [];
         var i = -1;
@@ -551,7 +582,7 @@ app.controller('Stats', ['$scope', '$http', '$routeParams', '$timeout', '$q', '$
 
             var env = response.config.params.environment;
 
-            _.each(_.groupBy(response.data, "name"), function(data, name) {
+            _.each(chartPoints(response.data), function(data, name) {
 
                 i++;
 
@@ -561,18 +592,10 @@ app.controller('Stats', ['$scope', '$http', '$routeParams', '$timeout', '$q', '$
                     type: 'spline',
                     color: Highcharts.getOptions().colors[i],
                     zIndex: 1,
-                    data: _.map(data, function(point) {
-                        return {
-                            x: Date.parse(point.created_at),
-                            y: point.measurement,
-                            min: _.min(point.values),
-                            max: _.max(point.values),
-                            result_id: point.result,
-                        };
-                    })
+                    data: data
                 });
 
-                if (data[0].values == undefined) {
+                if (data[0].min == undefined) {
                     // data does not have multiple values, skip the range
                     // data series
                     return;
@@ -588,11 +611,7 @@ app.controller('Stats', ['$scope', '$http', '$routeParams', '$timeout', '$q', '$
                     fillOpacity: 0.3,
                     zIndex: 0,
                     data: _.map(data, function(point) {
-                        return [
-                            Date.parse(point.created_at),
-                            _.min(point.values),
-                            _.max(point.values)
-                        ]
+                        return [point.x, point.min, point.max]
                     })
                 });
 